@@ -11,12 +11,15 @@
 #		- Accepts Input Parameters from HTML Form
 #		- Invokes Relevant functions from LogSearchView.py to get log Information for all Servers
 #		- Displays HTML Output on log Information along with Summary count for Keywords.
+#		- Streams the Output while the log files are searched (chunked HTTP/1.1 response)
+#		- Serves requests from a fixed number of threads with a bounded admission queue, runs a bounded number of searches at a time
 #		= Provides REST Service APIs to get Log Data in JSON and XML
 # Parameters:
 #		- Server Selection (Drop Down List)
 #       - Log Type Selection (Drop Down List)
 #		- Search Keywords (input text: e.g. stderr,error)
-#		- Search Criteria (Drop Down List e.g. all or any)
+#		- Search Criteria (Drop Down List e.g. all, any or query: the Search Keywords are then a search query e.g. Severity:error AND NOT timeout)
+#		- From / To (optional input text: e.g. -15m or 2026-10-18 09:30)
 # Installation:
 #       - Logon to the Server
 #       - Switch to Application/Service Account, if required
@@ -30,6 +33,17 @@
 # REST Service APIs:
 #		- http://<host_name_fqdn>:<port>/LogSearchView/rest/<output_format>/<env>/<cluster>/<server>/log_type/<search_keywords>/<search_criteria> 
 #		  e.g. http://<host_name_fqdn>:<port>/LogSearchView/rest/json/itg/cluster1/all/managed_server_log/stderr,error/all
+#		- Paging (optional): ?limit=<records>&offset=<records>&order=<oldest|newest>&total=<yes|no> or ?limit=<records>&cursor=<next_cursor>
+#		  e.g. http://<host_name_fqdn>:<port>/LogSearchView/rest/json/itg/cluster1/all/managed_server_log/stderr,error/all?limit=200&order=newest
+#		- Search query: <search_criteria> query with the query as <search_keywords>, URL encoded (a / as %2F)
+#		  e.g. http://<host_name_fqdn>:<port>/LogSearchView/rest/json/itg/cluster1/all/managed_server_log/Severity:error%20AND%20NOT%20timeout/query
+#		- Time range (optional, also for the Search Job APIs): ?from=<time>&to=<time>, a time is YYYY-MM-DD[ HH:MM[:SS]], -<number><s|m|h|d> before now or now
+#		  e.g. http://<host_name_fqdn>:<port>/LogSearchView/rest/json/itg/cluster1/all/managed_server_log/stderr,error/all?from=-15m
+# Search Job APIs:
+#		- Submit: POST http://<host_name_fqdn>:<port>/LogSearchView/jobs/<env>/<cluster>/<server>/log_type/<search_keywords>/<search_criteria> returns the job status with its job_id
+#		- Status: GET .../LogSearchView/jobs/<job_id> (progress: files, bytes, records so far and eta), .../jobs/<job_id>/progress streams the status as it changes
+#		- Results found so far: GET .../LogSearchView/jobs/<job_id>/json or .../jobs/<job_id>/xml
+#		- Cancel: DELETE .../LogSearchView/jobs/<job_id>
 # Change History:
 #	Initial:
 #		- Date: 11/20/2017
@@ -39,34 +53,119 @@ import sys
 import os
 import time
 from BaseHTTPServer import BaseHTTPRequestHandler,HTTPServer
-from SocketServer import ThreadingMixIn
+import threading
+import Queue
+import select
 import cgi
-import ConfigParser
+import urlparse
+import urllib
 import json
-from LogSearchView import performProcessingLogData, buildHTMLOutput, buildJSONOutput, buildXMLOutput, writeTextOutput
-from xml.dom import minidom
+from xml.sax.saxutils import escape
+import socket
+from LogSearchView import getConfig, startWorkerPool, stopWorkerPool, startResultCache, closeSSHConnections, joinSearch, streamHTMLOutput, streamJSONOutput, streamXMLOutput, streamTextOutput, streamSearchPage, parsePageCursor, submitSearchJob, getSearchJob, removeSearchJob, getSearchTimeOptions, buildKeywordMatcher
 
-# Change Property file location if required
-properties_file = "./LogSearchView.properties"
-config = ConfigParser.ConfigParser()
+# Searches run at a time by the web server, see main()
+search_slots = None
 
-class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+class BoundedThreadingMixIn:
+  # Connections are served by http_threads threads taking them from an admission queue of http_queue_size
+  # connections, instead of one new thread per connection. A connection which finds the queue full, or which
+  # waited longer than http_request_timeout for a thread, is refused with 503.
+
+  def startRequestThreads(self):
+    config = getConfig()
+    self.admission_queue = Queue.Queue(config.getInt("http_server", "http_queue_size"))
+    for i in range(config.getInt("http_server", "http_threads")):
+      request_thread = threading.Thread(target=self.serveRequests)
+      request_thread.daemon = True
+      request_thread.start()
+
+  def process_request(self, request, client_address):
+    try:
+      self.admission_queue.put_nowait((request, client_address, time.time()))
+    except Queue.Full:
+      self.refuseRequest(request)
+
+  def serveRequests(self):
+    while True:
+      request, client_address, admitted_time = self.admission_queue.get()
+      if time.time() - admitted_time > getConfig().getInt("http_server", "http_request_timeout"):
+        self.refuseRequest(request)
+        continue
+      try:
+        self.finish_request(request, client_address)
+      except:
+        self.handle_error(request, client_address)
+      self.shutdown_request(request)
+
+  def refuseRequest(self, request):
+    message = getConfig().get("messages", "error_server_busy")
+    try:
+      request.sendall("HTTP/1.0 503 Service Unavailable\r\nContent-Type: text/plain\r\nContent-Length: %d\r\nRetry-After: 5\r\nConnection: close\r\n\r\n%s" % (len(message), message))
+    except socket.error:
+      pass
+    self.shutdown_request(request)
+
+class ThreadedHTTPServer(BoundedThreadingMixIn, HTTPServer):
   allow_reuse_address = True
 
+class SearchSlots(object):
+  # Searches run at a time by the web server (http_max_searches). A request waits for a free slot up to its
+  # deadline and stops waiting as soon as its client has gone away.
+
+  def __init__(self, slots):
+    self.free_slots = slots
+    self.condition = threading.Condition()
+
+  def acquire(self, deadline, isClientConnected):
+    self.condition.acquire()
+    try:
+      while self.free_slots == 0:
+        remaining_time = deadline - time.time()
+        if remaining_time <= 0 or not isClientConnected():
+          return False
+        self.condition.wait(min(remaining_time, 1))
+      self.free_slots = self.free_slots - 1
+      return True
+    finally:
+      self.condition.release()
+
+  def release(self):
+    self.condition.acquire()
+    try:
+      self.free_slots = self.free_slots + 1
+      self.condition.notify()
+    finally:
+      self.condition.release()
+
 def main():
-  global properties_file, config
+  global search_slots
   try:
-    config.read(properties_file)
-    port_number = int(config.get("http_server", "port_number"))
+    config = getConfig()
+    port_number = config.getInt("http_server", "port_number")
+    # Worker processes are forked once before any request thread exists and reused by every search
+    if config.getBoolean("processing_info", "multi_processing"):
+      startWorkerPool()
+    startResultCache()
+    search_slots = SearchSlots(config.getInt("http_server", "http_max_searches"))
+    # Idle keep-alive connections are closed after http_keepalive_timeout seconds
+    HTTPRequestHandler.timeout = config.getInt("http_server", "http_keepalive_timeout")
     server = ThreadedHTTPServer(('', port_number), HTTPRequestHandler)
+    server.startRequestThreads()
     print 'Started httpserver on port ',port_number
     server.serve_forever()
   except KeyboardInterrupt:
     print '^C received, shutting down the web server'
     server.socket.close()
     server.shutdown
+  finally:
+    stopWorkerPool()
+    closeSSHConnections()
 
 class HTTPRequestHandler(BaseHTTPRequestHandler):
+  # Connections are kept open between requests: every response has a length or is chunked, except the
+  # responses streamed to HTTP/1.0 clients which close the connection
+  protocol_version = "HTTP/1.1"
 
   html_html_open = """<!DOCTYPE html>\n \
 		<html>\n"""
@@ -98,7 +197,8 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
             <td>\n \
               <ul style="margin:0">\n \
                 <li>URL Structure: http://<Host_name_fqdn>:port/LogSearchView/rest/&lt;output_format&gt;/&lt;env&gt;/&lt;cluster&gt;/&lt;server&gt;/&lt;log_type&gt;/&lt;search_keywords&gt;/&lt;search_criteria&gt;</li>\n \
-                <li>Parameters: &lt;output_format&gt;: json or xml; &lt;env&gt;: itg or prd; &lt;cluster&gt;: cluster1, cluster2, cluster3; &lt;server&gt;: Server Id e.g. server111 or all; &lt;log_type&gt;: access_log, db_log, managed_server_log or audit_log; &lt;search_keywords&gt;: Single or Multiple separated by comma e.g nullpointer or stderr,error; &lt;search_criteria&gt; all or any</li>\n \
+                <li>Parameters: &lt;output_format&gt;: json or xml; &lt;env&gt;: itg or prd; &lt;cluster&gt;: cluster1, cluster2, cluster3; &lt;server&gt;: Server Id e.g. server111 or all; &lt;log_type&gt;: access_log, db_log, managed_server_log or audit_log; &lt;search_keywords&gt;: Single or Multiple separated by comma e.g nullpointer or stderr,error, or a search query; &lt;search_criteria&gt; all, any or query</li>\n \
+                <li>Search query (Search Criteria query): terms with AND, OR, NOT and parentheses, "quoted phrases", /regular expressions/ and Header:term for a data element e.g. Severity:error AND NOT "Message Id":BEA-000449</li>\n \
                 <li>Example: http://<Host_name_fqdn>:port/LogSearchView/rest/json/itg/cluster2/all/managed_server_log/stderr,error/all</li>\n \
               </ul>\n \
             </td>\n \
@@ -110,43 +210,118 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
         <br>\n \
         <font color='red'><b>Please Note:</b>\n
         <ul style='margin:0;'>\n
-        <li>All Input Fields are Mandatory.</li>\n
+        <li>All Input Fields are Mandatory, except From and To.</li>\n
+        <li>From and To limit the search to the log records of a time range, e.g. From -15m for the last 15 minutes or From 2026-10-18 09:00 To 2026-10-18 10:00.</li>\n
         <li>Caution: If Log file size happens to be very large, the Search Criteria "Any" might cause longer time to get the Output Data.</li>\n
         </ul>\n
         </font>"""
+  html_output_open = """<div id='output'>\n 
+        <fieldset>\n 
+        <legend><b>Output Result</b></legend>\n"""
+  html_output_close = """\n
+        </fieldset></div>\n"""
   html_body_close = """</div>\n \
 	</body>\n"""
   html_html_close = """</html>"""
+  html_option = """<option value='%s'>%s</option>\n"""
+  # Request parameters of the from/to search options, the others are paging parameters
+  search_time_params = ["from", "to"]
 
-  def set_HEADERS(self):
+  def set_HEADERS(self, content_length):
     self.send_response(200)
     self.send_header('Content-type', 'text/html')
+    self.send_header("Content-Length", str(content_length))
+    self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+    self.send_header("Pragma", "no-cache")
+    self.send_header("Expires", "0")
+    self.end_headers()
+
+  def set_STREAM_HEADERS(self, content_type):
+    # Streamed responses are sent in chunks to HTTP/1.1 clients, HTTP/1.0 clients read up to the end of the connection
+    self.chunked_response = self.request_version == "HTTP/1.1"
+    if not self.chunked_response:
+      self.close_connection = 1
+    self.send_response(200)
+    self.send_header('Content-type', content_type)
     self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
     self.send_header("Pragma", "no-cache")
     self.send_header("Expires", "0")
+    if self.chunked_response:
+      self.send_header("Transfer-Encoding", "chunked")
+    else:
+      self.send_header("Connection", "close")
     self.end_headers()
+
+  def writeStream(self, chunks):
+    # Each chunk is sent on the connection as soon as it is produced, the search stops when the client goes away
+    try:
+      for chunk in chunks:
+        if len(chunk) == 0:
+          continue
+        if self.chunked_response:
+          self.connection.sendall("%x\r\n%s\r\n" % (len(chunk), chunk))
+        else:
+          self.connection.sendall(chunk)
+      if self.chunked_response:
+        self.connection.sendall("0\r\n\r\n")
+    except socket.error, e:
+      self.log_error("Client connection closed: %s", str(e))
+      self.close_connection = 1
+    finally:
+      chunks.close()
+
+  def isClientConnected(self):
+    # A client which closed the connection leaves the socket readable without any data
+    try:
+      if len(select.select([self.connection], [], [], 0)[0]) == 0:
+        return True
+      return len(self.connection.recv(1, socket.MSG_PEEK)) > 0
+    except socket.error:
+      return False
+
+  def acquireSearchSlot(self):
+    # False (after refusing the request with 503) when no search slot is free before the request deadline
+    deadline = time.time() + getConfig().getInt("http_server", "http_request_timeout")
+    if search_slots.acquire(deadline, self.isClientConnected):
+      return True
+    if self.isClientConnected():
+      self.send_error(503, self.getProperty("messages", "error_server_busy"))
+    else:
+      self.close_connection = 1
+    return False
+
+  def streamHTML(self, param_list):
+    yield self.buildHTMLForm() + self.html_output_open
+    for chunk in streamHTMLOutput(param_list, streamTextOutput(param_list, joinSearch(param_list)), True):
+      yield chunk
+    yield self.html_output_close + self.html_body_close + self.html_html_close
 	
   def do_GET(self):
     try:
       sendReply = False
       output_filename = self.getProperty("log_fileinfo", "output_filename")
-      if self.path == "/LogSearchView":
-        self.set_HEADERS()
+      if self.path.startswith("/LogSearchView/jobs/"):
+        self.getSearchJob(urlparse.urlsplit(self.path).path[len("/LogSearchView/jobs/"):].split("/"))
+      elif self.path == "/LogSearchView":
         self.log_filename_from_web_list = self.buildServerList()
         html = self.buildHTML("")
-        for line in html.splitlines():
-          self.wfile.write(line)
+        self.set_HEADERS(len(html))
+        self.wfile.write(html)
       elif output_filename in self.path:
         with open(output_filename, "r") as f:
+          output_data = f.read()
           self.send_response(200)
           self.send_header("Content-Type", 'application/text')
           self.send_header("Content-Disposition", 'attachment; filename=' + output_filename)
+          self.send_header("Content-Length", str(len(output_data)))
           self.end_headers()
-          self.wfile.write(f.read())
+          self.wfile.write(output_data)
       elif "LogSearchView/rest/" in self.path:
         input_params = []
         param_list = []
-        input_params = self.path.rsplit("/", 7)
+        request_url = urlparse.urlsplit(self.path)
+        # Parameters are split before they are decoded, so that a search query may hold an encoded / (%2F)
+        input_params = [urllib.unquote(input_param) for input_param in request_url.path.rsplit("/", 7)]
         output_type = input_params[1]
         param_list.append(input_params[2])
         param_list.append(input_params[3])
@@ -154,51 +329,173 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
         param_list.append(input_params[5])
         param_list.append(input_params[6])
         param_list.append(input_params[7])
-        self.send_response(200)
-        if output_type.lower() == "json":
-          self.send_header("Content-Type", 'application/json')
-        elif output_type.lower() == "xml":
-          self.send_header("Content-Type", 'application/xml')
-        self.end_headers()
-        output_list = performProcessingLogData(param_list)
-        if output_type.lower() == "json":
-          output_dict = buildJSONOutput(param_list, output_list)
-          self.wfile.write(json.dumps(output_dict, sort_keys=True, indent=4, separators=(',', ': ')))
-        elif output_type.lower() == "xml":
-          output_xml = buildXMLOutput(param_list, output_list)
-          self.wfile.write(minidom.parseString(output_xml).toprettyxml(indent = "    "))
+        try:
+          param_list.append(self.getSearchOptions(param_list[3], request_url.query))
+          page = self.getPage(request_url.query)
+          buildKeywordMatcher(param_list)
+        except ValueError, e:
+          self.send_error(400, self.getProperty("messages", "error_invalid_parameter_value") + " - " + str(e))
+          return
+        if not output_type.lower() in ["json", "xml"]:
+          self.send_response(200)
+          self.send_header("Content-Length", "0")
+          self.end_headers()
+          return
+        if not self.acquireSearchSlot():
+          return
+        try:
+          if page is None:
+            log_file_results = joinSearch(param_list)
+          else:
+            log_file_results = streamSearchPage(param_list, page)
+          if output_type.lower() == "json":
+            self.set_STREAM_HEADERS('application/json')
+            self.writeStream(streamJSONOutput(param_list, log_file_results, page))
+          else:
+            self.set_STREAM_HEADERS('application/xml')
+            self.writeStream(streamXMLOutput(param_list, log_file_results, page))
+        finally:
+          search_slots.release()
+      else:
+        self.send_error(404, 'Not found: %s' % self.path)
       return
     except IOError:
       self.send_error(404,'Error in sending html: %s' % self.path)
 
+  def sendJSON(self, status_code, data, headers=[]):
+    json_message = json.dumps(data, sort_keys=True, indent=4, separators=(',', ': '))
+    self.send_response(status_code)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+    self.send_header("Content-Length", str(len(json_message)))
+    for name, value in headers:
+      self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(json_message)
+
+  def getSearchJob(self, job_path):
+    # GET .../jobs/<job_id>[/progress|/json|/xml]
+    job = getSearchJob(job_path[0])
+    if job is None or len(job_path) > 2:
+      self.send_error(404, 'Not found: %s' % self.path)
+    elif len(job_path) == 1:
+      self.sendJSON(200, job.getStatus())
+    elif job_path[1] == "progress":
+      self.set_STREAM_HEADERS('application/json')
+      self.writeStream(self.streamJobProgress(job))
+    elif job_path[1] == "json":
+      self.set_STREAM_HEADERS('application/json')
+      self.writeStream(streamJSONOutput(job.param_list, iter(job.getResults())))
+    elif job_path[1] == "xml":
+      self.set_STREAM_HEADERS('application/xml')
+      self.writeStream(streamXMLOutput(job.param_list, iter(job.getResults())))
+    else:
+      self.send_error(404, 'Not found: %s' % self.path)
+
+  def streamJobProgress(self, job):
+    # One JSON status per line each time the progress changes (checked every second) until the job ends
+    last_status = None
+    while True:
+      results = len(job.results)
+      status = job.getStatus()
+      progress_status = dict(status)
+      del progress_status["elapsed"], progress_status["eta"]
+      if progress_status != last_status:
+        yield json.dumps(status, sort_keys=True) + "\n"
+        last_status = progress_status
+      if job.finished_time is not None:
+        return
+      job.waitForResults(results, 1)
+
+  def do_DELETE(self):
+    if self.path.startswith("/LogSearchView/jobs/"):
+      job = removeSearchJob(self.path[len("/LogSearchView/jobs/"):])
+      if job is not None:
+        self.sendJSON(200, job.getStatus())
+        return
+    self.send_error(404, 'Not found: %s' % self.path)
+
+  def submitSearchJob(self, job_params, query):
+    # POST .../jobs/<env>/<cluster>/<server>/<log_type>/<search_keywords>/<search_criteria>[?from=<time>&to=<time>]
+    if len(job_params) != 6:
+      self.send_error(404, 'Not found: %s' % self.path)
+      return
+    # A request body is not used, it is read so that the connection can be kept alive
+    self.rfile.read(int(self.headers.get("Content-Length", 0)))
+    try:
+      job_params.append(self.getSearchOptions(job_params[3], query))
+      buildKeywordMatcher(job_params)
+    except ValueError, e:
+      self.send_error(400, self.getProperty("messages", "error_invalid_parameter_value") + " - " + str(e))
+      return
+    job = submitSearchJob(job_params, search_slots)
+    if job is None:
+      self.send_error(503, self.getProperty("messages", "error_server_busy"))
+      return
+    self.sendJSON(202, job.getStatus(), [("Location", "/LogSearchView/jobs/" + job.job_id)])
+
+  def getSearchOptions(self, log_filetype, query):
+    # Search options of the from/to request parameters, see getSearchTimeOptions()
+    time_values = {}
+    for name, values in cgi.parse_qs(query).items():
+      if name in self.search_time_params:
+        time_values[name] = values[-1]
+    return getSearchTimeOptions(log_filetype, time_values)
+
+  def getPage(self, query):
+    # Paging parameters of the REST APIs, None when none is given and all records are returned
+    page_params = cgi.parse_qs(query)
+    for name in self.search_time_params:
+      page_params.pop(name, None)
+    if len(page_params) == 0:
+      return None
+    page = {"limit": int(self.getProperty("http_server", "rest_page_limit")), "offset": 0, "cursor": None, "order": "oldest", "total": False}
+    max_limit = int(self.getProperty("http_server", "rest_max_page_limit"))
+    for name, values in page_params.items():
+      value = values[-1]
+      if name == "limit" and value.isdigit() and 0 < int(value) <= max_limit:
+        page["limit"] = int(value)
+      elif name == "offset" and value.isdigit():
+        page["offset"] = int(value)
+      elif name == "order" and value in ["oldest", "newest"]:
+        page["order"] = value
+      elif name == "total" and value in ["yes", "no"]:
+        page["total"] = value == "yes"
+      elif name == "cursor":
+        page["cursor"] = value
+      else:
+        raise ValueError(name + "=" + value)
+    if page["cursor"] is not None and parsePageCursor(page["cursor"], page["order"]) is None:
+      raise ValueError("cursor=" + page["cursor"])
+    return page
+
   def getProperty(self, group, prop):
-    global properties_file, config
-    config.read(properties_file)
-    return config.get(group, prop)
+    return getConfig().get(group, prop)
 
   def buildServerList(self):
     server_ddl = []
     server_ddl_all = []
     sorted_server_ddl = []
-    environments = self.getProperty("environments", "env").split(",")
+    config = getConfig()
+    environments = config.getList("environments", "env")
     # -- Build All Options --#
     for environment in environments:
-      machines = self.getProperty("machine_info", environment).split(",")
+      machines = config.getList("machine_info", environment)
       for machine in machines:
-        clusters = self.getProperty(machine, "clusters").split(",")
+        clusters = config.getList(machine, "clusters")
         for cluster in clusters:
-          servers = self.getProperty(machine, cluster).split(",")
+          servers = config.getList(machine, cluster)
           for server in servers:
             server_ddl_all_item = environment + ":all:" + cluster + ":all"
             if not server_ddl_all_item in server_ddl_all:
               server_ddl_all.append(server_ddl_all_item)
     # -- Build individual server options -- #
     for environment in environments:
-      machines = self.getProperty("machine_info", environment).split(",")
+      machines = config.getList("machine_info", environment)
       for machine in machines:
-        clusters = self.getProperty(machine, "clusters").split(",")
+        clusters = config.getList(machine, "clusters")
         for cluster in clusters:
-          servers = self.getProperty(machine, cluster).split(",")
+          servers = config.getList(machine, cluster)
           for server in servers:
             server_ddl_item = environment + ":" + machine + ":" + cluster + ":" + server
             server_ddl.append(server_ddl_item)
@@ -215,7 +512,6 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
 
   def do_POST(self):
     if self.path=="/LogSearchView":
-      start_time = time.time()
       form = cgi.FieldStorage( \
         fp=self.rfile, \
         headers=self.headers, \
@@ -227,62 +523,67 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
       param_list.append(log_filename_from_web_items[2]) # Cluster
       param_list.append(log_filename_from_web_items[3].lower()) # Managed Server
       param_list.append(form["log_filetype_from_web"].value.lower()) # Log File Type
-      param_list.append(form["search_keywords_from_web"].value.lower()) # Search Keywords
+      if form["search_criteria_from_web"].value == "query":
+        param_list.append(form["search_keywords_from_web"].value) # Search Query, regular expressions keep their case
+      else:
+        param_list.append(form["search_keywords_from_web"].value.lower()) # Search Keywords
       param_list.append(form["search_criteria_from_web"].value) # Search Criteria
-      output_list = performProcessingLogData(param_list)
-      html_message = buildHTMLOutput(param_list, output_list, True)
-      writeTextOutput(param_list, output_list)  
-      self.set_HEADERS()
-      self.log_filename_from_web_list = self.buildServerList()
-      html = self.buildHTML(html_message)
-      end_time = time.time()
-      mi, ss = divmod(end_time - start_time, 60)
-      html = html.replace("$processing_time", self.getProperty("processing_info", "processing_time_header") + " " + str("%02dm %fs" %(mi, ss)))
-      for line in html.splitlines():
-        self.wfile.write(line)
+      try:
+        param_list.append(getSearchTimeOptions(param_list[3], {"from": form.getfirst("from_from_web", ""), "to": form.getfirst("to_from_web", "")})) # Search Options
+        buildKeywordMatcher(param_list)
+      except ValueError, e:
+        self.send_error(400, self.getProperty("messages", "error_invalid_parameter_value") + " - " + str(e))
+        return
+      # Log data is sent while the log files are searched and written to the text output file on the way
+      if not self.acquireSearchSlot():
+        return
+      try:
+        self.set_STREAM_HEADERS('text/html')
+        self.log_filename_from_web_list = self.buildServerList()
+        self.writeStream(self.streamHTML(param_list))
+      finally:
+        search_slots.release()
       return
+    if self.path.startswith("/LogSearchView/jobs/"):
+      request_url = urlparse.urlsplit(self.path)
+      self.submitSearchJob([urllib.unquote(job_param) for job_param in request_url.path[len("/LogSearchView/jobs/"):].split("/")], request_url.query)
+      return
+    self.send_error(404, 'Not found: %s' % self.path)
 	  
   def buildHTML(self, output):
-    html = "";
-    html = html + self.html_html_open + self.html_head + self.html_body_open
-    html = html + """<div id='input'>\n \
+    html = [self.buildHTMLForm()]
+    if len(output) > 0:
+      html.append(self.html_output_open + output + self.html_output_close)
+    html.append(self.html_body_close + self.html_html_close)
+    return "".join(html)
+
+  def buildHTMLOptions(self, values):
+    return "".join([self.html_option % (escape(value), escape(value)) for value in values])
+
+  def buildHTMLForm(self):
+    html = [self.html_html_open + self.html_head + self.html_body_open]
+    html.append("""<div id='input'>\n \
       <form name='LogSearchView' id='LogSearchView' method='POST'>\n \
 	  <fieldset>\n \
-	  <legend><b>Input Parameters</b></legend>\n"""
-    html_server_ddl = """[env:machine:cluster:server]: <select name='log_filename_from_web' id='log_filename_from_web'>\n"""
-    server_ddl = self.buildServerList()
-    for server_ddl_item in server_ddl:
-      html_server_ddl = html_server_ddl + """<option value='""" + server_ddl_item + """'>""" + server_ddl_item + """</option>\n"""
-    html_server_ddl = html_server_ddl + """</select>\n"""
-    html = html + html_server_ddl + "&nbsp;&nbsp;"
-    html_log_filetypes = """Log Type <select name='log_filetype_from_web' id='log_filetype_from_web'>\n"""
-    log_filetypes = self.getProperty("log_fileinfo", "log_filetype").split(",")
-    for log_filetype in log_filetypes:
-      html_log_filetypes = html_log_filetypes + """<option value='""" + log_filetype + """'>""" + log_filetype + """</option>\n"""
-    html_log_filetypes = html_log_filetypes + """</select>\n"""
-    html = html + html_log_filetypes + "&nbsp;&nbsp;"
-    html_search_keywords_input = """Search Keywords (e.g. stderr,error): <input type='text' name='search_keywords_from_web' id='search_keywords_from_web' size='30' required />\n"""
-    html = html + html_search_keywords_input + "&nbsp;&nbsp;"
-    html_search_criteria = """Search Criteria: <select name='search_criteria_from_web' id='search_criteria_from_web'>\n""" 
-    search_criteria = self.getProperty("log_fileinfo", "search_criteria").split(",")
-    for search_criteria_item in search_criteria:
-      html_search_criteria = html_search_criteria + """<option value='""" + search_criteria_item + """'>""" + search_criteria_item + """</option>\n"""
-    html_search_criteria = html_search_criteria + """</select>\n"""
-    html = html + html_search_criteria + "&nbsp;&nbsp;"
-    html_submit = """<input type='submit' name='submit' id='submit' value='Submit'>"""
-    html = html + html_submit
-    html = html + self.html_note_text
-    html = html + """</fieldset>\n \
-      </form>\n"""
-    html = html + """</div>\n"""
-    if len(output) > 0:
-      html = html + """<div id='output'>\n 
-        <fieldset>\n 
-        <legend><b>Output Result</b></legend>\n""" + output + """\n
-        </fieldset>"""
-      html = html + """</div>\n"""	  
-    html = html + self.html_body_close + self.html_html_close
-    return html
+	  <legend><b>Input Parameters</b></legend>\n""")
+    html.append("""[env:machine:cluster:server]: <select name='log_filename_from_web' id='log_filename_from_web'>\n""")
+    html.append(self.buildHTMLOptions(self.buildServerList()))
+    html.append("""</select>\n""" + "&nbsp;&nbsp;")
+    html.append("""Log Type <select name='log_filetype_from_web' id='log_filetype_from_web'>\n""")
+    html.append(self.buildHTMLOptions(self.getProperty("log_fileinfo", "log_filetype").split(",")))
+    html.append("""</select>\n""" + "&nbsp;&nbsp;")
+    html.append("""Search Keywords (e.g. stderr,error or a query): <input type='text' name='search_keywords_from_web' id='search_keywords_from_web' size='30' required />\n""" + "&nbsp;&nbsp;")
+    html.append("""Search Criteria: <select name='search_criteria_from_web' id='search_criteria_from_web'>\n""")
+    html.append(self.buildHTMLOptions(self.getProperty("log_fileinfo", "search_criteria").split(",")))
+    html.append("""</select>\n""" + "&nbsp;&nbsp;")
+    html.append("""From (e.g. -15m): <input type='text' name='from_from_web' id='from_from_web' size='16' />\n""" + "&nbsp;&nbsp;")
+    html.append("""To: <input type='text' name='to_from_web' id='to_from_web' size='16' />\n""" + "&nbsp;&nbsp;")
+    html.append("""<input type='submit' name='submit' id='submit' value='Submit'>""")
+    html.append(self.html_note_text)
+    html.append("""</fieldset>\n \
+      </form>\n""")
+    html.append("""</div>\n""")
+    return "".join(html)
 
 if __name__ == "__main__":
   main()
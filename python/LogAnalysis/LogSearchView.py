@@ -20,8 +20,11 @@
 #       - Cluster Name (e.g. cluster1, cluster2, cluster3)
 #       - Server Name (e.g. all or server1)
 #		- Log Type (e.g access_log, db_log, server_log)
-#		- Search Keywords (comma separated e.g. stderr,error)
-#		- Search Criteria (All [equivalent to "and"], Any [equivalent to "or"])
+#		- Search Keywords (comma separated e.g. stderr,error), or a search query with the Search Criteria Query
+#		  (e.g. 'Severity:error AND NOT "Message Id":BEA-000449', see parseQuery())
+#		- Search Criteria (All [equivalent to "and"], Any [equivalent to "or"], Query)
+#		- Optional: incremental=yes (only search log data added since the previous incremental run)
+#		- Optional: from=<time> and to=<time> (only search log records of a time range e.g. from=-15m)
 # Dependency: 
 #		- Properties File:
 #			- Name: LogSearchView.properties
@@ -53,10 +56,112 @@ import ConfigParser
 from xml.etree import ElementTree as ET
 from xml.dom import minidom
 import multiprocessing
+import threading
+import Queue
+import signal
+import mmap
+import json
+import struct
+from xml.sax.saxutils import escape
+import zlib
+import hashlib
+import fcntl
+import collections
+import heapq
+import tempfile
+import itertools
+import uuid
+import cStringIO
+import errno
 
 # Change Property file location if required
 properties_file = "./LogSearchView.properties"
-config = ConfigParser.ConfigParser()
+# Scanner sent to remote machines when remote_agent is enabled, kept next to this script
+agent_script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LogSearchViewAgent.py")
+# Seconds between checks of the properties file modification time
+config_check_interval = 1
+config_snapshot = None
+config_checked_time = 0
+config_lock = threading.Lock()
+# Bytes of a memory mapped log file lowered at a time when looking for keywords, see readMatchingLines()
+mmap_block_size = 4 * 1024 * 1024
+# Bytes read at a time by the reader stage of a search, see ReadAheadStream
+read_ahead_chunk_size = 64 * 1024
+# Block index file: header (magic, inode of the log file), then one record per block of whole lines
+# (start, end, crc32 of the last bytes of the block) followed by a bitmap of the block's 4 byte sequences
+block_index_magic = "LSVIDX01"
+block_index_header = struct.Struct("!8sQ")
+block_index_record = struct.Struct("!QQI")
+block_index_gram_size = 4
+block_index_bitmap_size = 8192
+block_index_check_size = 256
+# Distinct values of a data element shared between the records of a log file, see LogElementValues
+compact_element_values = 1024
+compact_check_records = 4096
+# Tokens of a search query (see parseQuery()): parentheses, "phrase", /regex/, field separator and words
+query_token_regex = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|/((?:[^/\\]|\\.)+)/|(:)|([^\s():"]+))')
+query_operators = ["AND", "OR", "NOT"]
+# Record of a temporary file of worker results: number of data elements, their lengths, then the data elements
+spooled_record_count = struct.Struct("!H")
+spooled_record_structs = {}
+# Fragments of the HTML output
+html_output_script = """\n \
+            </h4>\n \
+            <script type="text/javascript">\n \
+              function highlightSelectedRow(table_id, server) {\n \
+                table = document.getElementById(table_id);\n \
+                for (var i = 1; i < table.rows.length; i++) {\n \
+                  var cells = table.rows[i].cells;
+                  if (cells[5].id == server) \n \
+                    table.rows[i].style.backgroundColor = "yellow";\n \
+                  else\n \
+                    table.rows[i].style.backgroundColor = "";\n \
+                }\n \
+              }\n \
+              function showHideLogData(table_id, cluster) {\n \
+                table = document.getElementById(table_id);\n \
+                for (var i = 0; i < table.rows.length; i++) {\n \
+                  if (table.rows[i].id == cluster)\n \
+                    table.rows[i].style.display = "";\n \
+                  else\n \
+                    table.rows[i].style.display = "none";\n \
+                }\n \
+              }\n \
+            </script>\n \
+          </head>\n \
+	  <body>\n """
+html_output_count_table_open = """	    <table id='logCount' border=1>\n \
+              <thead>\n \
+	      <tr bgcolor=#f0f0f0>\n"""
+html_output_count_table_close = """\n \
+              </tbody>\n \
+            </table>\n \
+            <br>\n \
+            <br>\n """
+html_output_data_table_open = """	    <table id='logData' border=1>\n \
+              <thead>\n \
+	      <tr bgcolor=#f0f0f0>\n """
+html_output_data_table_close = """\n \
+        </tbody>\n \
+        </table>\n """
+html_output_close = """      </body>\n \
+    </html>"""
+html_output_download = """<b>Download:</b> <a href='/%s'>Text Output File</a><br><br>\n"""
+html_output_spilled = """<b>%s</b> %d<br><br>\n"""
+html_output_count_row_open = """<tr>\n\n"""
+html_output_count_fixed_cell = """\n \
+             <td>%s</td>\n"""
+html_output_count_cell = """\n \
+          <td align='right'>%s</td>\n"""
+html_output_count_link_cell = """\n \
+            <td id='%(server)s' align='right'><a href="#" onclick="highlightSelectedRow('logCount', '%(server)s');showHideLogData('logData', '%(server)s');">%(count)s</a></td>\n"""
+html_output_data_row_open = """<tr id='%s'>\n\n"""
+html_output_data_cell = """\n \
+          <td>%s</td>\n"""
+html_output_row_close = """</tr>\n"""
+# Log data rows escaped and rendered together, see renderHTMLDataRows(), and the cell templates by row length
+html_output_batch_rows = 500
+html_output_cell_templates = {}
 
 input_param_env = ""
 input_param_cluster_name = ""
@@ -64,23 +169,98 @@ input_param_server_name = ""
 input_param_log_file_type = ""
 input_param_search_keywords = ""
 input_param_search_criteria = ""
+# Values of each search option, None for the time options (see parseSearchTime())
+search_option_values = {"incremental": ["yes", "no"], "from": None, "to": None}
+search_option_defaults = {"incremental": "no", "from": None, "to": None}
+search_time_units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+search_time_formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"]
+
+# Worker pool shared by all searches of a long running process (e.g. the web server), see startWorkerPool()
+worker_pool = None
+worker_pool_slots = None
+# Search results kept by a long running process, see startResultCache()
+result_cache = None
+# Searches running for the requests of a long running process, see joinSearch()
+search_flights = {}
+search_flights_lock = threading.Lock()
+# Searches run in the background for the job API of a long running process, see submitSearchJob()
+search_jobs = {}
+search_jobs_lock = threading.Lock()
+
+class LogSearchConfig(object):
+  # Immutable snapshot of the properties file. It is parsed once and replaced as a whole by getConfig()
+  # when the file changes, so a caller holding a snapshot always sees consistent values.
+
+  def __init__(self, properties_file, file_stamp):
+    parser = ConfigParser.ConfigParser()
+    parser.read(properties_file)
+    sections = {}
+    for section in parser.sections():
+      sections[section] = dict(parser.items(section))
+    object.__setattr__(self, "_sections", sections)
+    object.__setattr__(self, "file_stamp", file_stamp)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("LogSearchConfig is read only")
+
+  def get(self, group, prop):
+    if not group in self._sections:
+      raise ConfigParser.NoSectionError(group)
+    options = self._sections[group]
+    prop = prop.lower()
+    if not prop in options:
+      raise ConfigParser.NoOptionError(prop, group)
+    return options[prop]
+
+  def has(self, group, prop):
+    return group in self._sections and prop.lower() in self._sections[group]
+
+  def getList(self, group, prop):
+    return self.get(group, prop).split(",")
+
+  def getInt(self, group, prop):
+    return int(self.get(group, prop))
+
+  def getPercent(self, group, prop):
+    return int(self.get(group, prop).rstrip("%"))
+
+  def getBoolean(self, group, prop):
+    return self.get(group, prop).lower() == "yes"
+
+def getConfig():
+  global config_snapshot, config_checked_time
+  snapshot = config_snapshot
+  if snapshot is not None and time.time() - config_checked_time < config_check_interval:
+    return snapshot
+  config_lock.acquire()
+  try:
+    try:
+      file_info = os.stat(properties_file)
+      file_stamp = (file_info.st_mtime, file_info.st_size)
+    except OSError:
+      file_stamp = None
+    if config_snapshot is None or config_snapshot.file_stamp != file_stamp:
+      config_snapshot = LogSearchConfig(properties_file, file_stamp)
+    config_checked_time = time.time()
+    return config_snapshot
+  finally:
+    config_lock.release()
 
 def getProperty(group, prop):
-  global properties_file, config
-  config.read(properties_file)
-  return config.get(group, prop)
+  return getConfig().get(group, prop)
 
 def validateClusterServer(env, object_type, object_id):
   isFound = False
-  machines = getProperty("machine_info", env).split(",")
+  config = getConfig()
+  machines = config.getList("machine_info", env)
   for machine in machines:
-    clusters = getProperty(machine, "clusters").split(",")
+    clusters = config.getList(machine, "clusters")
     if object_type == "cluster":
       if object_id in clusters:
         isFound = True    
     if object_type == "server":
       for cluster in clusters:
-        servers = getProperty(machine, cluster).split(",")
+        servers = config.getList(machine, cluster)
         if object_id in servers:
           isFound = True
           break
@@ -92,7 +272,7 @@ def validateInputParameters():
   param_list = []
   isErrorFound = False
   global input_param_env, input_param_cluster_name, input_param_server_name, input_param_log_file_type, input_param_search_keywords, input_param_search_criteria
-  if len(sys.argv) <> 7:
+  if len(sys.argv) < 7:
     print getProperty("messages", "error_type") + " " + getProperty("messages", "error_invalid_number_of_parameters")
     sys.exit()
   env = getProperty("environments", "env").split(",")
@@ -116,14 +296,43 @@ def validateInputParameters():
   if not sys.argv[6].lower() in search_criteria:
     print getProperty("messages", "error_type") + " " + getProperty("messages", "error_invalid_parameter_value") + " - " + sys.argv[6]
     isErrorFound = True
+  elif sys.argv[6].lower() == "query" and sys.argv[4] in log_filetype:
+    try:
+      QueryMatcher(sys.argv[5], sys.argv[4].lower())
+    except ValueError, e:
+      print getProperty("messages", "error_type") + " " + getProperty("messages", "error_invalid_parameter_value") + " - " + str(e)
+      isErrorFound = True
+  # Optional search options follow the six parameters as name=value
+  search_options = {}
+  for search_option in sys.argv[7:]:
+    name, sep, value = search_option.partition("=")
+    name = name.lower()
+    if sep and name in search_option_values and search_option_values[name] is None:
+      try:
+        search_options[name] = parseSearchTime(value)
+        continue
+      except ValueError:
+        pass
+    elif sep and name in search_option_values and value.lower() in search_option_values[name]:
+      search_options[name] = value.lower()
+      continue
+    print getProperty("messages", "error_type") + " " + getProperty("messages", "error_invalid_parameter_value") + " - " + search_option
+    isErrorFound = True
+  if not isErrorFound and ("from" in search_options or "to" in search_options) and not hasTimestamps(sys.argv[4].lower()):
+    print getProperty("messages", "error_type") + " " + getProperty("messages", "error_invalid_parameter_value") + " - " + sys.argv[4]
+    isErrorFound = True
   if isErrorFound:
     sys.exit()
   param_list.append(sys.argv[1].lower()) # Env
   param_list.append(sys.argv[2])         # Cluster
   param_list.append(sys.argv[3])         # Managed Server
   param_list.append(sys.argv[4].lower()) # Log File Type
-  param_list.append(sys.argv[5].lower()) # Search Keywords
+  if sys.argv[6].lower() == "query":
+    param_list.append(sys.argv[5])       # Search Query, regular expressions keep their case
+  else:
+    param_list.append(sys.argv[5].lower()) # Search Keywords
   param_list.append(sys.argv[6].lower()) # Search Criteria
+  param_list.append(search_options)      # Search Options
   input_param_env = sys.argv[1]
   input_param_cluster_name = sys.argv[2]
   input_param_server_name = sys.argv[3]
@@ -132,18 +341,55 @@ def validateInputParameters():
   input_param_search_criteria = sys.argv[6]
   return param_list
 
+def parseSearchTime(value):
+  # Seconds since the epoch of a from/to search option: a local time (e.g. 2026-10-18 09:30), a time before now
+  # (e.g. -15m, -2h, -1d) or now. ValueError for any other value.
+  value = value.strip()
+  if value.lower() == "now":
+    return int(time.time())
+  if value[:1] == "-" and value[-1:].lower() in search_time_units and value[1:-1].isdigit():
+    return int(time.time()) - int(value[1:-1]) * search_time_units[value[-1:].lower()]
+  for search_time_format in search_time_formats:
+    try:
+      return int(time.mktime(time.strptime(value, search_time_format)))
+    except (ValueError, OverflowError):
+      pass
+  raise ValueError("Invalid time - " + value)
+
+def formatSearchTime(search_time):
+  return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(search_time))
+
+def getSearchTimeOptions(log_filetype, time_values):
+  # Search options of the from/to times of a web request (see parseSearchTime()), empty values are left out.
+  # ValueError for an invalid time or a log type without time stamps.
+  search_options = {}
+  for name in ["from", "to"]:
+    value = time_values.get(name, "")
+    if value.strip() != "":
+      search_options[name] = parseSearchTime(value)
+  if len(search_options) > 0 and not hasTimestamps(log_filetype):
+    raise ValueError("No time stamps - " + log_filetype)
+  return search_options
+
+def getSearchOption(param_list, name):
+  # Search options are given on the command line and as web request parameters (from/to), other callers get the default
+  if len(param_list) > 6 and name in param_list[6]:
+    return param_list[6][name]
+  return search_option_defaults[name]
+
 def getMachines(env, object_type, object_id):
   isFound = False
   machines = []
-  all_machines = getProperty("machine_info", env).split(",")
+  config = getConfig()
+  all_machines = config.getList("machine_info", env)
   for machine in all_machines:
-    clusters = getProperty(machine, "clusters").split(",")
+    clusters = config.getList(machine, "clusters")
     if object_type == "cluster":
       if object_id in clusters:
         machines.append(machine)
     if object_type == "server":
       for cluster in clusters:
-        servers = getProperty(machine, cluster).split(",")
+        servers = config.getList(machine, cluster)
         if object_id in servers:
           machines.append(machine)
           isFound = True
@@ -152,90 +398,1217 @@ def getMachines(env, object_type, object_id):
         break
   return machines
 
-def updateKeywordCount(keyword_count_server, line, search_keywords):
+class KeywordMatcher(object):
+  # Built once per search: keywords are lowered up front and each candidate line is lowered only once.
+  # Per keyword counts are taken only for the lines satisfying the search criteria.
+
+  def __init__(self, search_keywords, search_criteria):
+    self.search_keywords = search_keywords
+    self.search_criteria = search_criteria
+    self.match_keywords = tuple([search_keyword.lower() for search_keyword in search_keywords])
+    # Block index codes of each keyword, None for keywords too short to be looked up in the index
+    self.match_gram_codes = []
+    for match_keyword in self.match_keywords:
+      if len(match_keyword) < block_index_gram_size:
+        self.match_gram_codes.append(None)
+      else:
+        self.match_gram_codes.append(set([getGramCode(gram) for gram in getGrams(match_keyword)]))
+
+  def matchLine(self, line):
+    line = line.lower()
+    if self.search_criteria == "all":
+      for match_keyword in self.match_keywords:
+        if not match_keyword in line:
+          return None
+    elif self.search_criteria == "any":
+      for match_keyword in self.match_keywords:
+        if match_keyword in line:
+          break
+      else:
+        return None
+    else:
+      return None
+    return [line.count(match_keyword) for match_keyword in self.match_keywords]
+
+  def getPrefilterKeywords(self):
+    # Lowered keywords one of which is contained by every matching line, None when any line may match
+    if self.search_criteria == "all":
+      prefilter_keywords = [max(self.match_keywords, key=len)]
+    elif self.search_criteria == "any":
+      prefilter_keywords = []
+      # A line containing "error" also contains "err", looking for the shorter keyword is enough
+      for match_keyword in sorted(set(self.match_keywords), key=len):
+        for prefilter_keyword in prefilter_keywords:
+          if prefilter_keyword in match_keyword:
+            break
+        else:
+          prefilter_keywords.append(match_keyword)
+    else:
+      prefilter_keywords = []
+    if "" in prefilter_keywords:
+      return None
+    return prefilter_keywords
+
+  def matchBlockBitmap(self, block_index, bitmap_offset):
+    # False when no line of the block can match: a keyword is only contained by a block having all its 4 byte sequences
+    keywords_found = []
+    for gram_codes in self.match_gram_codes:
+      keyword_found = True
+      if gram_codes is not None:
+        for gram_code in gram_codes:
+          if not ord(block_index[bitmap_offset + (gram_code >> 3)]) & (1 << (gram_code & 7)):
+            keyword_found = False
+            break
+      keywords_found.append(keyword_found)
+    if self.search_criteria == "all":
+      return not False in keywords_found
+    elif self.search_criteria == "any":
+      return True in keywords_found
+    return False
+
+def tokenizeQuery(query):
+  # [token type, text, start, end] of the tokens of a search query, the token type is "(", ")", ":", "phrase", "regex" or "word"
+  tokens = []
+  position = 0
+  query = query.rstrip()
+  while position < len(query):
+    match = query_token_regex.match(query, position)
+    if match is None:
+      raise ValueError("Invalid query at " + str(position + 1) + " - " + query[position:])
+    token_type = ["(", ")", "phrase", "regex", ":", "word"][match.lastindex - 1]
+    text = match.group(match.lastindex)
+    if token_type == "phrase":
+      text = re.sub(r"\\(.)", r"\1", text)
+    elif token_type == "regex":
+      text = text.replace("\\/", "/")
+    tokens.append([token_type, text, match.end() - len(match.group(0).lstrip()), match.end()])
+    position = match.end()
+  return tokens
+
+def isQueryOperator(token, operator):
+  return token[0] == "word" and token[1].upper() == operator
+
+def parseQuery(query, data_element_logmsg_headers):
+  # Plan of a search query of the Search Criteria Query, as nested lists: ["or", [nodes]], ["and", [nodes]], ["not", node]
+  # and ["term", text in the query, lowered literal, regular expression, data element id]. A term is a word, a "quoted
+  # phrase" or a /regular expression/, optionally scoped to a data element by its header (e.g. Severity:error or
+  # "Message Id":BEA-000449). Terms next to each other must all match, NOT binds tighter than AND and AND tighter than
+  # OR. Matching ignores case. ValueError for an invalid query.
+  tokens = tokenizeQuery(query)
+  if len(tokens) == 0:
+    raise ValueError("Empty query")
+  node, position = parseQueryOr(query, tokens, 0, [header.lower() for header in data_element_logmsg_headers])
+  if position < len(tokens):
+    raise ValueError("Unexpected " + tokens[position][1] + " at " + str(tokens[position][2] + 1) + " - " + query)
+  return node
+
+def parseQueryOr(query, tokens, position, headers):
+  node, position = parseQueryAnd(query, tokens, position, headers)
+  nodes = [node]
+  while position < len(tokens) and isQueryOperator(tokens[position], "OR"):
+    node, position = parseQueryAnd(query, tokens, position + 1, headers)
+    nodes.append(node)
+  return (nodes[0] if len(nodes) == 1 else ["or", nodes]), position
+
+def parseQueryAnd(query, tokens, position, headers):
+  node, position = parseQueryNot(query, tokens, position, headers)
+  nodes = [node]
+  while position < len(tokens) and tokens[position][0] != ")" and not isQueryOperator(tokens[position], "OR"):
+    if isQueryOperator(tokens[position], "AND"):
+      position = position + 1
+    node, position = parseQueryNot(query, tokens, position, headers)
+    nodes.append(node)
+  return (nodes[0] if len(nodes) == 1 else ["and", nodes]), position
+
+def parseQueryNot(query, tokens, position, headers):
+  if position < len(tokens) and isQueryOperator(tokens[position], "NOT"):
+    node, position = parseQueryNot(query, tokens, position + 1, headers)
+    return ["not", node], position
+  return parseQueryTerm(query, tokens, position, headers)
+
+def parseQueryTerm(query, tokens, position, headers):
+  if position >= len(tokens):
+    raise ValueError("Incomplete query - " + query)
+  token = tokens[position]
+  if token[0] == "(":
+    node, position = parseQueryOr(query, tokens, position + 1, headers)
+    if position >= len(tokens) or tokens[position][0] != ")":
+      raise ValueError("Missing ) - " + query)
+    return node, position + 1
+  term_start = token[2]
+  element_id = None
+  if token[0] in ["word", "phrase"] and position + 1 < len(tokens) and tokens[position + 1][0] == ":":
+    if not token[1].lower() in headers:
+      raise ValueError("Unknown data element " + token[1] + " - " + query)
+    element_id = headers.index(token[1].lower())
+    position = position + 2
+    if position >= len(tokens):
+      raise ValueError("Incomplete query - " + query)
+    token = tokens[position]
+  if not token[0] in ["word", "phrase", "regex"] or (token[0] == "word" and token[1].upper() in query_operators):
+    raise ValueError("Unexpected " + token[1] + " at " + str(token[2] + 1) + " - " + query)
+  literal, pattern = (None, None)
+  if token[0] == "regex":
+    try:
+      re.compile(token[1])
+    except re.error, e:
+      raise ValueError("Invalid regular expression " + token[1] + " - " + str(e))
+    pattern = token[1]
+  else:
+    literal = token[1].lower()
+  return ["term", query[term_start:token[3]], literal, pattern, element_id], position + 1
+
+def getQueryNodeCost(node):
+  # Relative cost of evaluating a node of a query plan: literal terms, then scoped literal terms, then regular expressions
+  if node[0] == "term":
+    return (1 if node[2] is not None else 4) + (0 if node[4] is None else 1)
+  if node[0] == "not":
+    return getQueryNodeCost(node[1])
+  return sum([getQueryNodeCost(child) for child in node[1]])
+
+def orderQueryPlan(node):
+  # The branches of AND and OR nodes cheapest first, so that a line is mostly decided by the cheap terms
+  if node[0] == "not":
+    return ["not", orderQueryPlan(node[1])]
+  if node[0] in ["and", "or"]:
+    return [node[0], sorted([orderQueryPlan(child) for child in node[1]], key=getQueryNodeCost)]
+  return node
+
+def getQueryTerms(node, negated=False):
+  # [term, negated] of each term of a query plan
+  if node[0] == "term":
+    return [[node, negated]]
+  if node[0] == "not":
+    return getQueryTerms(node[1], not negated)
+  terms = []
+  for child in node[1]:
+    terms.extend(getQueryTerms(child, negated))
+  return terms
+
+def getQueryPrefilterKeywords(node):
+  # Lowered literals one of which is contained by every line matching a query plan node, None when any line may match
+  if node[0] == "term":
+    return ([node[2]] if node[2] else None)
+  if node[0] == "or":
+    prefilter_keywords = []
+    for child in node[1]:
+      child_keywords = getQueryPrefilterKeywords(child)
+      if child_keywords is None:
+        return None
+      prefilter_keywords.extend([keyword for keyword in child_keywords if not keyword in prefilter_keywords])
+    return prefilter_keywords
+  if node[0] == "and":
+    # The branch whose shortest literal is the longest one
+    prefilter_keywords = None
+    for child in node[1]:
+      child_keywords = getQueryPrefilterKeywords(child)
+      if child_keywords is not None and (prefilter_keywords is None or min(map(len, child_keywords)) > min(map(len, prefilter_keywords))):
+        prefilter_keywords = child_keywords
+    return prefilter_keywords
+  return None
+
+def getQueryTermText(term, line, record, splitRecord):
+  # The line or, for a scoped term, its data element. record is [] until the data elements are separated once.
+  if term[4] is None:
+    return line
+  if len(record) == 0:
+    record.append(splitRecord(line))
+  if term[4] < len(record[0]):
+    return record[0][term[4]]
+  return ""
+
+def matchQueryNode(node, line, record, regexes, splitRecord):
+  if node[0] == "term":
+    text = getQueryTermText(node, line, record, splitRecord)
+    if node[2] is not None:
+      return node[2] in text
+    return regexes[node[3]].search(text) is not None
+  if node[0] == "and":
+    for child in node[1]:
+      if not matchQueryNode(child, line, record, regexes, splitRecord):
+        return False
+    return True
+  if node[0] == "or":
+    for child in node[1]:
+      if matchQueryNode(child, line, record, regexes, splitRecord):
+        return True
+    return False
+  return not matchQueryNode(node[1], line, record, regexes, splitRecord)
+
+def countQueryTerm(term, line, record, regexes, splitRecord):
+  text = getQueryTermText(term, line, record, splitRecord)
+  if term[2] is not None:
+    return (text.count(term[2]) if term[2] else 0)
+  return len(regexes[term[3]].findall(text))
+
+class QueryMatcher(object):
+  # Built once per search with the Search Criteria Query, used as KeywordMatcher. The query is parsed into a plan (see
+  # parseQuery()) whose branches are ordered cheapest first. A line is first checked for the literals one of which every
+  # matching line contains, the plan is only evaluated for these candidates and the data elements of a line are only
+  # separated for scoped terms. Counts are taken per term outside NOT, or of the matching lines without such terms.
+
+  def __init__(self, query, log_filetype):
+    config = getConfig()
+    self.query = query
+    self.search_criteria = "query"
+    self.data_element_tag = config.get(log_filetype, "data_element_tag")
+    self.regex_start_plus_end_tag = getDataElementRegex(self.data_element_tag)
+    self.plan = orderQueryPlan(parseQuery(query, config.getList(log_filetype, "data_element_logmsg_headers")))
+    self.count_terms = []
+    self.regexes = {}
+    self.literal_gram_codes = {}
+    for term, negated in getQueryTerms(self.plan):
+      if not negated and not term[1] in [count_term[1] for count_term in self.count_terms]:
+        self.count_terms.append(term)
+      if term[3] is not None:
+        self.regexes[term[3]] = re.compile(term[3], re.IGNORECASE)
+      elif len(term[2]) >= block_index_gram_size:
+        self.literal_gram_codes[term[2]] = set([getGramCode(gram) for gram in getGrams(term[2])])
+    self.search_keywords = [count_term[1] for count_term in self.count_terms] or [query]
+    self.prefilter_keywords = getQueryPrefilterKeywords(self.plan)
+
+  def splitRecord(self, line):
+    return splitLogLine(line, self.data_element_tag, self.regex_start_plus_end_tag)
+
+  def matchLine(self, line):
+    line = line.lower()
+    if self.prefilter_keywords is not None:
+      for prefilter_keyword in self.prefilter_keywords:
+        if prefilter_keyword in line:
+          break
+      else:
+        return None
+    record = []
+    if not matchQueryNode(self.plan, line, record, self.regexes, self.splitRecord):
+      return None
+    if len(self.count_terms) == 0:
+      return [1]
+    return [countQueryTerm(count_term, line, record, self.regexes, self.splitRecord) for count_term in self.count_terms]
+
+  def getPrefilterKeywords(self):
+    return self.prefilter_keywords
+
+  def matchBlockBitmap(self, block_index, bitmap_offset):
+    return self.matchNodeBitmap(self.plan, block_index, bitmap_offset)
+
+  def matchNodeBitmap(self, node, block_index, bitmap_offset):
+    # False when no line of the block can match node, a NOT node may match any block
+    if node[0] == "term":
+      for gram_code in self.literal_gram_codes.get(node[2], []):
+        if not ord(block_index[bitmap_offset + (gram_code >> 3)]) & (1 << (gram_code & 7)):
+          return False
+      return True
+    if node[0] == "and":
+      for child in node[1]:
+        if not self.matchNodeBitmap(child, block_index, bitmap_offset):
+          return False
+      return True
+    if node[0] == "or":
+      for child in node[1]:
+        if self.matchNodeBitmap(child, block_index, bitmap_offset):
+          return True
+      return False
+    return True
+
+  def getSearchSpec(self):
+    # Query of the LogSearchViewAgent.py search specification
+    return {"plan": self.plan, "count_terms": self.count_terms, "prefilter_keywords": self.prefilter_keywords}
+
+def buildKeywordMatcher(param_list):
+  # KeywordMatcher of the Search Keywords and Criteria, QueryMatcher of a search query. ValueError for an invalid query.
+  if param_list[5] == "query":
+    return QueryMatcher(param_list[4], param_list[3])
+  return KeywordMatcher(param_list[4].split(","), param_list[5])
+
+def buildKeywordCount(search_keywords):
+  keyword_count_server = []
   for search_keyword in search_keywords:
-    for keyword_count_server_row in keyword_count_server:
-      if keyword_count_server_row[0] == search_keyword:
-        keyword_count_server_row[1] = keyword_count_server_row[1] + line.lower().count(search_keyword)
+    keyword_count_server.append([search_keyword, 0])
+  return keyword_count_server
+
+def updateKeywordCount(keyword_count_server, keyword_counts):
+  for i in range(len(keyword_counts)):
+    keyword_count_server[i][1] = keyword_count_server[i][1] + keyword_counts[i]
   return keyword_count_server
+
+def hasTimestamps(log_filetype):
+  config = getConfig()
+  return config.has(log_filetype, "timestamp_headers") and config.get(log_filetype, "timestamp_headers") != ""
+
+def parseTimestamp(value, timestamp_format):
+  # Seconds since the epoch of a record time stamp, a trailing time zone name is ignored. None when it cannot be read.
+  for text in [value, value.rsplit(" ", 1)[0]]:
+    try:
+      return time.mktime(time.strptime(text, timestamp_format))
+    except (ValueError, OverflowError):
+      pass
+  return None
+
+class TimeFilter(object):
+  # Built once per search with the from/to search options: the time stamp of a record is read from the data elements
+  # timestamp_headers of the log type. Records whose time stamp cannot be read are kept. Consecutive records mostly
+  # share the time stamp text, so the last one read is kept.
+
+  def __init__(self, log_filetype, time_from, time_to):
+    config = getConfig()
+    data_element_logmsg_headers = config.getList(log_filetype, "data_element_logmsg_headers")
+    self.element_ids = [data_element_logmsg_headers.index(header) for header in config.getList(log_filetype, "timestamp_headers")]
+    self.timestamp_format = config.get(log_filetype, "timestamp_format")
+    self.sorted = config.getBoolean(log_filetype, "timestamp_sorted")
+    self.time_from = time_from
+    self.time_to = time_to
+    self.last_value = None
+    self.last_timestamp = None
+
+  def getTimestamp(self, line_elements):
+    if len(line_elements) <= max(self.element_ids):
+      return None
+    value = " ".join([line_elements[element_id].strip() for element_id in self.element_ids])
+    if value != self.last_value:
+      self.last_value, self.last_timestamp = (value, parseTimestamp(value, self.timestamp_format))
+    return self.last_timestamp
+
+  def matchTimestamp(self, timestamp):
+    return (self.time_from is None or timestamp >= self.time_from) and (self.time_to is None or timestamp <= self.time_to)
+
+  def matchRecord(self, line_elements):
+    timestamp = self.getTimestamp(line_elements)
+    return timestamp is None or self.matchTimestamp(timestamp)
+
+  def getSearchSpec(self):
+    # Time filter of the LogSearchViewAgent.py search specification
+    return {"element_ids": self.element_ids, "timestamp_format": self.timestamp_format, "sorted": self.sorted,
+      "from": self.time_from, "to": self.time_to, "probe_size": getConfig().getInt("processing_info", "timestamp_probe_kb") * 1024}
+
+def getTimeRangeParameters(param_list):
+  # [name, local time] of the from/to search options given, as shown with the input parameters
+  return [[name, formatSearchTime(getSearchOption(param_list, name))] for name in ["from", "to"] if getSearchOption(param_list, name) is not None]
+
+def getTimeFilter(param_list):
+  if len(getTimeRangeParameters(param_list)) == 0:
+    return None
+  return TimeFilter(param_list[3], getSearchOption(param_list, "from"), getSearchOption(param_list, "to"))
       
-def mergeLine(c, l):
-  if c:
-    return c.rstrip() + " " + l
+def joinRecordLines(record_lines):
+  # Lines of a multiline record joined into one line: trailing white space of each line but the last is replaced by a
+  # space, lines holding only white space are left out
+  return " ".join([record_line for record_line in [line.rstrip() for line in record_lines[:-1]] if record_line] + record_lines[-1:])
+
+def sshOptions():
+  # All ssh calls go through one multiplexed connection per machine when ssh_connection_reuse is set. The
+  # control socket is shared by every process and search, an unused connection is closed by ssh after
+  # ssh_idle_timeout seconds.
+  config = getConfig()
+  if not config.getBoolean("processing_info", "ssh_connection_reuse"):
+    return []
+  return ["-o", "ControlMaster=auto",
+    "-o", "ControlPath=" + os.path.join(config.get("processing_info", "ssh_control_path"), "LogSearchView-%C"),
+    "-o", "ControlPersist=" + config.get("processing_info", "ssh_idle_timeout")]
+
+def sshCommand(machine_name, remote_command):
+  return ["ssh"] + sshOptions() + [machine_name, remote_command]
+
+def openSSHConnections(machines):
+  # Opens the shared connections to the remote machines of a search in parallel, before the workers of
+  # the search would each start their own handshake with the same machine
+  if not getConfig().getBoolean("processing_info", "ssh_connection_reuse"):
+    return
+  ssh_processes = []
+  for machine in set(machines):
+    if machine != socket.gethostname():
+      ssh_processes.append(subprocess.Popen(sshCommand(machine, "true")))
+  for ssh_process in ssh_processes:
+    ssh_process.wait()
+
+def closeSSHConnections():
+  config = getConfig()
+  if not config.getBoolean("processing_info", "ssh_connection_reuse"):
+    return
+  machines = set()
+  for env in config.getList("environments", "env"):
+    machines.update(config.getList("machine_info", env))
+  for machine in machines:
+    if machine != socket.gethostname():
+      with open(os.devnull, "w") as devnull:
+        subprocess.call(["ssh"] + sshOptions() + ["-O", "exit", machine], stdout=devnull, stderr=devnull)
+
+def selectRangeLines(lines, byte_range, regex_record_start):
+  # lines must be positioned on the last byte before the range when it does not start at 0. With
+  # regex_record_start the range is also aligned on lines starting a record: leading lines continuing
+  # a record of the previous range are skipped and lines past the range end are read up to the next
+  # record start.
+  start, end = byte_range or (0, None)
+  offset = start
+  if start > 0:
+    offset = start - 1 + len(lines.readline())
+  record_found = start == 0 or regex_record_start is None
+  for line in lines:
+    if end is not None and offset >= end and (regex_record_start is None or regex_record_start.match(line)):
+      break
+    offset = offset + len(line)
+    if not record_found:
+      if not regex_record_start.match(line):
+        continue
+      record_found = True
+    yield line
+
+def getReadCommand(log_filename_with_path, start):
+  # The existence check and the read share one ssh call, a missing file reads as empty
+  if start > 0:
+    # tail -c +N starts at the 1 based byte N, i.e. the last byte before the range
+    remote_command = "tail -c +" + str(start) + " " + pipes.quote(log_filename_with_path)
   else:
-    return l
+    remote_command = "cat " + pipes.quote(log_filename_with_path)
+  return "test -e " + pipes.quote(log_filename_with_path) + " && " + remote_command
 
-def parseSinglelineBlock(machine_name, log_filename_with_path, regex_start_plus_end_tag, number_of_data_elements):
-  if machine_name == socket.gethostname():
+def readLogLines(machine_name, log_filename_with_path, byte_range=None, regex_record_start=None, read_ahead=None):
+  # Yields the lines of a local or remote log file. With byte_range (start, end) only the lines starting
+  # inside the range are read, end None meaning up to the end of file. A line crossing start belongs to
+  # the previous range, a line crossing end is read in full. The lines are taken from the stream of
+  # read_ahead (see LogReadAhead) when it already reads the log file from start.
+  start = (byte_range or (0, None))[0]
+  read_ahead_stream = (None if read_ahead is None else read_ahead.take(("lines", machine_name, log_filename_with_path, start)))
+  if read_ahead_stream is not None:
+    try:
+      try:
+        for line in selectRangeLines(read_ahead_stream, byte_range, regex_record_start):
+          yield line
+      except EnvironmentError:
+        print getProperty("messages", "error_reading_log_file") + " - " + machine_name + ":" + log_filename_with_path
+        sys.exit()
+    finally:
+      read_ahead_stream.close()
+  elif machine_name == socket.gethostname():
     if os.path.isfile(log_filename_with_path):
       try:
         with open(log_filename_with_path) as lines:
-          for line in lines:
-            if len(re.findall(regex_start_plus_end_tag, line)) == (number_of_data_elements - 1):
-              yield line
-              continue
-      except:
+          if start > 0:
+            lines.seek(start - 1)
+          for line in selectRangeLines(lines, byte_range, regex_record_start):
+            yield line
+      except EnvironmentError:
         print getProperty("messages", "error_reading_log_file") + " - " + log_filename_with_path
         sys.exit()
   else:
-    if subprocess.call(["ssh", machine_name, 'test -e ' + pipes.quote(log_filename_with_path)]) == 0:
+    ssh = subprocess.Popen(sshCommand(machine_name, getReadCommand(log_filename_with_path, start)), stdout=subprocess.PIPE)
+    try:
       try:
-        ssh = subprocess.Popen(["ssh", machine_name, "cat", log_filename_with_path], stdout=subprocess.PIPE)
-        for line in ssh.stdout:
-          if len(re.findall(regex_start_plus_end_tag, line)) == (number_of_data_elements - 1):
-            yield line
-            continue
-      except:
+        for line in selectRangeLines(ssh.stdout, byte_range, regex_record_start):
+          yield line
+      except EnvironmentError:
         print getProperty("messages", "error_reading_log_file") + " - " + machine_name + ":" + log_filename_with_path
         sys.exit()
+    finally:
+      if ssh.poll() is None:
+        ssh.kill()
+      ssh.stdout.close()
+      ssh.wait()
 
-def parseMultilineBlock(machine_name, log_filename_with_path, regex_start_tag, regex_end_tag, regex_start_plus_end_tag, number_of_data_elements):
-  if machine_name == socket.gethostname():
-    if os.path.isfile(log_filename_with_path):
+class ReadAheadStream(object):
+  # File like reader (readline(), read() and line iteration) of a log file or of the output of an ssh process, filled
+  # by a background thread with chunks of read_ahead_chunk_size bytes. At most buffers chunks are held: the thread
+  # waits while they are all full, so a stream read ahead of its search only holds a bounded amount of memory. A read
+  # error is raised by the read reaching it.
+
+  def __init__(self, source, process=None, buffers=1):
+    self.source = source
+    self.process = process
+    self.chunks = Queue.Queue(buffers)
+    self.pending = ""
+    self.position = 0
+    self.eof = False
+    self.stopped = False
+    self.thread = threading.Thread(target=self.fill)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def fill(self):
+    try:
+      while not self.stopped:
+        try:
+          chunk = os.read(self.source.fileno(), read_ahead_chunk_size)
+        except OSError, e:
+          if e.errno == errno.EINTR:
+            continue
+          raise
+        self.chunks.put(chunk)
+        if not chunk:
+          break
+    except EnvironmentError, e:
+      self.chunks.put(e)
+
+  def readChunk(self):
+    # Appends the next chunk to the data not read yet
+    chunk = self.chunks.get()
+    if isinstance(chunk, EnvironmentError):
+      self.eof = True
+      raise chunk
+    if not chunk:
+      self.eof = True
+    self.pending = self.pending[self.position:] + chunk
+    self.position = 0
+
+  def readline(self):
+    line_end = self.pending.find("\n", self.position)
+    while line_end < 0 and not self.eof:
+      searched = len(self.pending) - self.position
+      self.readChunk()
+      line_end = self.pending.find("\n", searched)
+    line_end = (len(self.pending) if line_end < 0 else line_end + 1)
+    line = self.pending[self.position:line_end]
+    self.position = line_end
+    return line
+
+  def read(self, size):
+    while len(self.pending) - self.position < size and not self.eof:
+      self.readChunk()
+    data = self.pending[self.position:self.position + size]
+    self.position = self.position + len(data)
+    return data
+
+  def __iter__(self):
+    # The whole lines of the data read are split at once, only a line crossing the end of a chunk is joined
+    while True:
+      lines_end = self.pending.rfind("\n", self.position) + 1
+      if lines_end > self.position:
+        lines = self.pending[self.position:lines_end]
+        self.position = lines_end
+        for line in cStringIO.StringIO(lines):
+          yield line
+      elif self.eof:
+        break
+      else:
+        self.readChunk()
+    if self.position < len(self.pending):
+      line = self.pending[self.position:]
+      self.position = len(self.pending)
+      yield line
+
+  def close(self):
+    # The thread is stopped first, emptying the buffers it may be waiting on, then the ssh process and the source
+    self.stopped = True
+    if self.process is not None and self.process.poll() is None:
+      self.process.kill()
+    while self.thread.is_alive():
       try:
-        with open(log_filename_with_path) as lines:
-          linecache, halfline = ("", False)
-          for line in lines:
-            if len(re.findall(regex_start_plus_end_tag, line)) == number_of_data_elements:
-              yield line
-              continue
-            if not halfline:
-              linecache = ""
-            linecache = mergeLine(linecache, line)
-            if halfline:
-              halfline = not re.match(regex_end_tag, line)
-            else:
-              halfline = re.match(regex_start_tag, line)
-            if not halfline:
-              yield linecache
-          if halfline:
-            yield linecache
-      except:
-        print getProperty("messages", "error_reading_log_file") + " - " + log_filename_with_path
-        sys.exit()
-  else:
-    if subprocess.call(["ssh", machine_name, 'test -e ' + pipes.quote(log_filename_with_path)]) == 0:
+        while True:
+          self.chunks.get_nowait()
+      except Queue.Empty:
+        pass
+      self.thread.join(0.1)
+    self.source.close()
+    if self.process is not None:
+      self.process.wait()
+
+def openReadAheadStream(read_ahead_key, buffers):
+  # Stream of a key of getReadAheadKey(), None when the log file can not be opened (the search then reports it)
+  if read_ahead_key[0] == "agent":
+    machine, remote_command = read_ahead_key[1:]
+    with open(agent_script_file) as agent_script:
+      ssh = subprocess.Popen(sshCommand(machine, remote_command), stdin=agent_script, stdout=subprocess.PIPE)
+    return ReadAheadStream(ssh.stdout, ssh, buffers)
+  machine, log_filename_with_path, start = read_ahead_key[1:]
+  if machine != socket.gethostname():
+    ssh = subprocess.Popen(sshCommand(machine, getReadCommand(log_filename_with_path, start)), stdout=subprocess.PIPE)
+    return ReadAheadStream(ssh.stdout, ssh, buffers)
+  if not os.path.isfile(log_filename_with_path):
+    return None
+  try:
+    log_file = open(log_filename_with_path)
+  except EnvironmentError:
+    return None
+  if start > 0:
+    log_file.seek(start - 1)
+  return ReadAheadStream(log_file, None, buffers)
+
+class LogReadAhead(object):
+  # Reader stage of a search run without multi processing (see streamParseLogFile()). While a log file is searched,
+  # the streams of the next read_ahead_files log files are opened and read in the background into bounded buffers
+  # (read_ahead_buffer_kb each), so reading local files and waiting on ssh overlaps with searching. read_ahead_keys
+  # holds the getReadAheadKey() of each log file of the search, a search takes the stream of its key with take().
+
+  def __init__(self, read_ahead_keys):
+    config = getConfig()
+    self.read_ahead_keys = read_ahead_keys
+    self.files = config.getInt("processing_info", "read_ahead_files")
+    self.buffers = max(1, config.getInt("processing_info", "read_ahead_buffer_kb") * 1024 / read_ahead_chunk_size)
+    self.streams = {}
+    self.next_file = 0
+
+  def advance(self, file_index):
+    # Opens the streams of the log files up to read_ahead_files after the one about to be searched
+    while self.next_file < min(len(self.read_ahead_keys), file_index + self.files + 1):
+      read_ahead_key = self.read_ahead_keys[self.next_file]
+      self.next_file = self.next_file + 1
+      if read_ahead_key is not None and not read_ahead_key in self.streams:
+        read_ahead_stream = openReadAheadStream(read_ahead_key, self.buffers)
+        if read_ahead_stream is not None:
+          self.streams[read_ahead_key] = read_ahead_stream
+
+  def take(self, read_ahead_key):
+    return self.streams.pop(read_ahead_key, None)
+
+  def close(self):
+    # Streams of log files not searched (e.g. the search was stopped)
+    for read_ahead_stream in self.streams.values():
+      read_ahead_stream.close()
+    self.streams = {}
+
+def readMatchingLines(log_filename_with_path, byte_range, prefilter_keywords):
+  # Memory mapped scan of a local log file yielding only the lines containing one of the prefilter
+  # keywords. The file is lowered one block of whole lines at a time and searched in place, so the
+  # lines without a keyword are never sliced out as separate strings. byte_range as in readLogLines().
+  start, end = byte_range or (0, None)
+  if not os.path.isfile(log_filename_with_path):
+    return
+  try:
+    with open(log_filename_with_path, "rb") as log_file:
+      file_size = os.fstat(log_file.fileno()).st_size
+      if file_size == 0:
+        return
+      log_buffer = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
       try:
-        ssh = subprocess.Popen(["ssh", machine_name, "cat", log_filename_with_path], stdout=subprocess.PIPE)
-        linecache, halfline = ("", False)
-        for line in ssh.stdout:
-          if len(re.findall(regex_start_plus_end_tag, line)) == number_of_data_elements:
-            yield line
-            continue
-          if not halfline:
-            linecache = ""
-          linecache = mergeLine(linecache, line)
-          if halfline:
-            halfline = not re.match(regex_end_tag, line)
-          else:
-            halfline = re.match(regex_start_tag, line)
-          if not halfline:
-            yield linecache
-        if halfline:
-          yield linecache
-      except:
-        print getProperty("messages", "error_reading_log_file") + " - " + machine_name + ":" + log_filename_with_path
+        if start > 0:
+          start = log_buffer.find("\n", start - 1) + 1
+          if start == 0:
+            return
+        if end is None or end > file_size:
+          end = file_size
+        block_start = start
+        while block_start < end:
+          block_end = log_buffer.find("\n", min(block_start + mmap_block_size, end) - 1) + 1
+          if block_end == 0:
+            block_end = file_size
+          block = log_buffer[block_start:block_end].lower()
+          matching_lines = {}
+          for prefilter_keyword in prefilter_keywords:
+            keyword_position = block.find(prefilter_keyword)
+            while keyword_position >= 0:
+              line_start = block.rfind("\n", 0, keyword_position) + 1
+              line_end = block.find("\n", keyword_position) + 1
+              if line_end == 0:
+                line_end = len(block)
+              matching_lines[line_start] = line_end
+              keyword_position = block.find(prefilter_keyword, line_end)
+          for line_start in sorted(matching_lines):
+            yield log_buffer[block_start + line_start:block_start + matching_lines[line_start]]
+          block_start = block_end
+      finally:
+        log_buffer.close()
+  except EnvironmentError:
+    print getProperty("messages", "error_reading_log_file") + " - " + log_filename_with_path
+    sys.exit()
+
+def getCompleteLinesEnd(log_filename_with_path, start):
+  # Offset following the last new line of a local log file, start when there is none after start
+  try:
+    with open(log_filename_with_path, "rb") as log_file:
+      if os.fstat(log_file.fileno()).st_size <= start:
+        return start
+      log_buffer = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        return max(start, log_buffer.rfind("\n", start) + 1)
+      finally:
+        log_buffer.close()
+  except EnvironmentError:
+    print getProperty("messages", "error_reading_log_file") + " - " + log_filename_with_path
+    sys.exit()
+
+def getGrams(text):
+  return set([text[i:i + block_index_gram_size] for i in xrange(len(text) - block_index_gram_size + 1)])
+
+def getGramCode(gram):
+  # Bit of the block bitmap, independent of the python version and hash seed
+  return zlib.crc32(gram) & (block_index_bitmap_size * 8 - 1)
+
+def buildBlockBitmap(block):
+  block_bitmap = bytearray(block_index_bitmap_size)
+  for gram in getGrams(block):
+    gram_code = getGramCode(gram)
+    block_bitmap[gram_code >> 3] |= 1 << (gram_code & 7)
+  return block_bitmap
+
+def getBlockIndexFilename(log_filename_with_path):
+  block_index_path = getProperty("processing_info", "block_index_path")
+  return os.path.join(block_index_path, os.path.basename(log_filename_with_path) + "." + hashlib.md5(log_filename_with_path).hexdigest() + ".idx")
+
+def getBlockIndexCheck(log_file, block_start, block_end):
+  check_start = max(block_start, block_end - block_index_check_size)
+  log_file.seek(check_start)
+  return zlib.crc32(log_file.read(block_end - check_start)) & 0xffffffff
+
+def updateBlockIndex(log_filename_with_path):
+  # Returns the block index of a local log file after indexing the blocks of whole lines added since the
+  # last search. The index is rebuilt when the log file was rotated or truncated. Searches of the same
+  # log file wait for each other through a lock on the index file.
+  block_index_filename = getBlockIndexFilename(log_filename_with_path)
+  if not os.path.isdir(os.path.dirname(block_index_filename)):
+    try:
+      os.makedirs(os.path.dirname(block_index_filename))
+    except OSError:
+      if not os.path.isdir(os.path.dirname(block_index_filename)):
+        raise
+  block_size = getConfig().getInt("processing_info", "block_index_block_kb") * 1024
+  record_size = block_index_record.size + block_index_bitmap_size
+  block_index_file = os.fdopen(os.open(block_index_filename, os.O_RDWR | os.O_CREAT, 0644), "r+b")
+  try:
+    fcntl.flock(block_index_file.fileno(), fcntl.LOCK_EX)
+    log_file = open(log_filename_with_path, "rb")
+    try:
+      log_file_stat = os.fstat(log_file.fileno())
+      block_index = block_index_file.read()
+      indexed_end = 0
+      index_valid = len(block_index) >= block_index_header.size and (len(block_index) - block_index_header.size) % record_size == 0
+      if index_valid:
+        index_valid = block_index_header.unpack_from(block_index) == (block_index_magic, log_file_stat.st_ino)
+      if index_valid and len(block_index) > block_index_header.size:
+        block_start, indexed_end, block_check = block_index_record.unpack_from(block_index, len(block_index) - record_size)
+        index_valid = indexed_end <= log_file_stat.st_size and getBlockIndexCheck(log_file, block_start, indexed_end) == block_check
+      if not index_valid:
+        block_index = block_index_header.pack(block_index_magic, log_file_stat.st_ino)
+        indexed_end = 0
+        block_index_file.seek(0)
+        block_index_file.truncate()
+        block_index_file.write(block_index)
+      new_records = []
+      log_file.seek(indexed_end)
+      while log_file_stat.st_size - indexed_end >= block_size:
+        block = log_file.read(block_size) + log_file.readline()
+        if not block.endswith("\n"):
+          break
+        block_check = zlib.crc32(block[-block_index_check_size:]) & 0xffffffff
+        new_records.append(block_index_record.pack(indexed_end, indexed_end + len(block), block_check))
+        new_records.append(str(buildBlockBitmap(block.lower())))
+        indexed_end = indexed_end + len(block)
+      if new_records:
+        block_index_file.seek(0, 2)
+        block_index_file.write("".join(new_records))
+        block_index = block_index + "".join(new_records)
+    finally:
+      log_file.close()
+  finally:
+    block_index_file.close()
+  return block_index
+
+def getBlockIndexRanges(log_filename_with_path, byte_range, keyword_matcher):
+  # Byte ranges (within byte_range) of the blocks which may contain a matching line and of the end of
+  # file not indexed yet, adjacent ranges joined
+  start, end = byte_range or (0, None)
+  block_index = updateBlockIndex(log_filename_with_path)
+  record_size = block_index_record.size + block_index_bitmap_size
+  byte_ranges = []
+  indexed_end = 0
+  for record_offset in xrange(block_index_header.size, len(block_index), record_size):
+    block_start, block_end = block_index_record.unpack_from(block_index, record_offset)[:2]
+    indexed_end = block_end
+    if block_end <= start or (end is not None and block_start >= end):
+      continue
+    if keyword_matcher.matchBlockBitmap(block_index, record_offset + block_index_record.size):
+      byte_ranges.append([max(block_start, start), block_end if end is None else min(block_end, end)])
+  if end is None or end > indexed_end:
+    byte_ranges.append([max(indexed_end, start), end])
+  joined_byte_ranges = []
+  for byte_range in byte_ranges:
+    if joined_byte_ranges and joined_byte_ranges[-1][1] == byte_range[0]:
+      joined_byte_ranges[-1][1] = byte_range[1]
+    else:
+      joined_byte_ranges.append(byte_range)
+  return [tuple(byte_range) for byte_range in joined_byte_ranges]
+
+def readIndexedMatchingLines(log_filename_with_path, byte_range, prefilter_keywords, keyword_matcher):
+  # readMatchingLines() over the blocks which may contain a matching line according to the block index.
+  # Without a usable index the whole byte range is read.
+  if not os.path.isfile(log_filename_with_path):
+    return
+  try:
+    byte_ranges = getBlockIndexRanges(log_filename_with_path, byte_range, keyword_matcher)
+  except EnvironmentError, e:
+    print getProperty("messages", "warning_type") + " " + getProperty("messages", "warning_block_index") + " - " + log_filename_with_path + " - " + str(e)
+    byte_ranges = [byte_range]
+  for byte_range in byte_ranges:
+    for line in readMatchingLines(log_filename_with_path, byte_range, prefilter_keywords):
+      yield line
+
+def readLogFileBytes(machine_name, log_filename_with_path, offset, size):
+  # Reads size bytes at offset of a local or remote log file, remote files with a ranged read
+  if machine_name == socket.gethostname():
+    try:
+      with open(log_filename_with_path, "rb") as log_file:
+        log_file.seek(offset)
+        return log_file.read(size)
+    except EnvironmentError:
+      print getProperty("messages", "error_reading_log_file") + " - " + log_filename_with_path
+      sys.exit()
+  remote_command = "tail -c +" + str(offset + 1) + " " + pipes.quote(log_filename_with_path) + " | head -c " + str(size)
+  ssh = subprocess.Popen(sshCommand(machine_name, remote_command), stdout=subprocess.PIPE)
+  return ssh.communicate()[0]
+
+def getLogFileSize(machine_name, log_filename_with_path):
+  # None for a missing file
+  if machine_name == socket.gethostname():
+    if not os.path.isfile(log_filename_with_path):
+      return None
+    return os.path.getsize(log_filename_with_path)
+  remote_command = "test -f " + pipes.quote(log_filename_with_path) + " && wc -c < " + pipes.quote(log_filename_with_path)
+  ssh = subprocess.Popen(sshCommand(machine_name, remote_command), stdout=subprocess.PIPE)
+  output = ssh.communicate()[0].strip()
+  if ssh.returncode != 0 or not output.isdigit():
+    return None
+  return int(output)
+
+def getDataElementRegex(data_element_tag):
+  # Regular expression separating the data elements of single line tags, or enclosing them for tags of two characters
+  if len(data_element_tag) == 0:
+    return re.compile(r"!.")
+  elif len(data_element_tag) == 1:
+    return re.compile(r"" + re.escape(data_element_tag) + r"")
+  elif data_element_tag[:1] == "\\":
+    return re.compile(r"" + data_element_tag + r"")
+  return re.compile(r"" + re.escape(data_element_tag[:1]) + r"(.*?)" + r"" + re.escape(data_element_tag[1:]))
+
+def splitLogLine(line, data_element_tag, regex_start_plus_end_tag):
+  # Data elements of a line (or of a record merged from several lines) as separated by the data element tag
+  if len(data_element_tag) == 0:
+    return [line]
+  elif len(data_element_tag) == 1:
+    return line.split(data_element_tag)
+  elif data_element_tag[:1] == "\\":
+    return re.split(regex_start_plus_end_tag, line)
+  return re.findall(regex_start_plus_end_tag, line)
+
+def getProbeTimestamp(machine_name, log_filename_with_path, offset, end, time_filter, splitLine):
+  # (offset, time stamp) of the first line starting at or after offset and before end whose time stamp can be read
+  # within timestamp_probe_kb, None if there is none
+  probe_start = max(offset - 1, 0)
+  probe = readLogFileBytes(machine_name, log_filename_with_path, probe_start, getConfig().getInt("processing_info", "timestamp_probe_kb") * 1024)
+  # The probe starts on the last byte before offset, so that a line starting at offset is found
+  line_start = 0
+  if offset > 0:
+    line_start = probe.find("\n") + 1
+    if line_start == 0:
+      return None
+  while True:
+    line_end = probe.find("\n", line_start) + 1
+    if line_end == 0 or probe_start + line_start >= end:
+      break
+    timestamp = time_filter.getTimestamp(splitLine(probe[line_start:line_end]))
+    if timestamp is not None:
+      return (probe_start + line_start, timestamp)
+    line_start = line_end
+  return None
+
+def seekTimestamp(machine_name, log_filename_with_path, start, end, time_filter, splitLine, isAfter, seek_start):
+  # Binary search of the first line in [start, end) whose time stamp isAfter(). The offset returned is before it for
+  # seek_start and after it otherwise, within timestamp_probe_kb, so the lines without a time stamp are never left out.
+  probe_size = getConfig().getInt("processing_info", "timestamp_probe_kb") * 1024
+  low, high = (start, end)
+  while high - low > probe_size:
+    middle = (low + high) / 2
+    probe = getProbeTimestamp(machine_name, log_filename_with_path, middle, high, time_filter, splitLine)
+    if probe is None:
+      if seek_start:
+        high = middle
+      else:
+        low = middle
+    elif isAfter(probe[1]):
+      high = (middle if seek_start else probe[0])
+    else:
+      low = probe[0]
+  return (low if seek_start else high)
+
+def seekTimeRange(machine_name, log_filename_with_path, byte_range, log_file_size, time_filter, splitLine):
+  # Narrows byte_range (see readLogLines()) of a log file appended in time order to the lines of the records between
+  # the from and to times of time_filter
+  start, end = byte_range or (0, None)
+  seek_end = (log_file_size if end is None else min(end, log_file_size))
+  if time_filter.time_from is not None:
+    start = seekTimestamp(machine_name, log_filename_with_path, start, seek_end, time_filter, splitLine, lambda timestamp: timestamp >= time_filter.time_from, True)
+  if time_filter.time_to is not None:
+    seek_end = seekTimestamp(machine_name, log_filename_with_path, start, seek_end, time_filter, splitLine, lambda timestamp: timestamp > time_filter.time_to, False)
+    end = seek_end
+  return (start, end)
+
+def parseSinglelineBlock(machine_name, log_filename_with_path, regex_start_plus_end_tag, number_of_data_elements, byte_range=None, prefilter_keywords=None, checkpoint=None, keyword_matcher=None, read_ahead=None):
+  # With a checkpoint (see getScanCheckpoint()) the file is read from the checkpoint offset, which is moved
+  # past every complete line. A last line still being written is left for the next incremental run.
+  use_mmap = prefilter_keywords is not None and machine_name == socket.gethostname() and getConfig().getBoolean("processing_info", "mmap_local_files")
+  if checkpoint is not None and use_mmap:
+    # Memory mapped files are searched up to the end of the last complete line
+    byte_range = (checkpoint["offset"], getCompleteLinesEnd(log_filename_with_path, checkpoint["offset"]))
+    checkpoint["offset"] = byte_range[1]
+    checkpoint = None
+  if checkpoint is not None:
+    lines = readLogLines(machine_name, log_filename_with_path, (checkpoint["offset"], None), None, read_ahead)
+  elif use_mmap:
+    if keyword_matcher is not None and getConfig().getBoolean("processing_info", "block_index"):
+      lines = readIndexedMatchingLines(log_filename_with_path, byte_range, prefilter_keywords, keyword_matcher)
+    else:
+      lines = readMatchingLines(log_filename_with_path, byte_range, prefilter_keywords)
+  else:
+    lines = readLogLines(machine_name, log_filename_with_path, byte_range, None, read_ahead)
+  for line in lines:
+    if checkpoint is not None:
+      if not line.endswith("\n"):
+        break
+      checkpoint["offset"] = checkpoint["offset"] + len(line)
+    if len(re.findall(regex_start_plus_end_tag, line)) == (number_of_data_elements - 1):
+      yield line
+
+def parseMultilineBlock(machine_name, log_filename_with_path, data_element_tag, regex_start_tag, regex_start_plus_end_tag, number_of_data_elements, byte_range=None, checkpoint=None, read_ahead=None):
+  # Yields (record, data elements) of a log type with data element tags spread over multiple lines (e.g. <>). A line
+  # holding all the data elements is a record by itself, its data elements are separated once and handed over. Any other
+  # line starting with the start tag opens a record: the following lines are only kept until one holds the end tag, and
+  # the record is then joined once (see joinRecordLines()) with data elements None, they are only separated for the
+  # records matching the search. A record keeps multiline_record_max_kb of lines, the lines beyond are left out except
+  # the one closing it. Byte ranges are aligned on lines starting with the start tag, a record still open at the end of
+  # the range is closed there. With a checkpoint the record left open by the previous incremental run is resumed and a
+  # record still open at the end of file is kept for the next one.
+  data_element_start_tag = data_element_tag[:1]
+  data_element_end_tag = data_element_tag[1:]
+  record_max_size = getConfig().getInt("processing_info", "multiline_record_max_kb") * 1024
+  if checkpoint is not None:
+    lines = readLogLines(machine_name, log_filename_with_path, (checkpoint["offset"], None), None, read_ahead)
+    record_lines = ([checkpoint["linecache"]] if checkpoint["halfline"] else [])
+  else:
+    lines = readLogLines(machine_name, log_filename_with_path, byte_range, regex_start_tag, read_ahead)
+    record_lines = []
+  record_size = sum(map(len, record_lines))
+  for line in lines:
+    if checkpoint is not None:
+      if not line.endswith("\n"):
+        break
+      checkpoint["offset"] = checkpoint["offset"] + len(line)
+    # Each data element takes an end tag, lines with fewer end tags are not scanned for data elements
+    if line.count(data_element_end_tag) >= number_of_data_elements:
+      line_elements = regex_start_plus_end_tag.findall(line)
+      if len(line_elements) == number_of_data_elements:
+        yield line, line_elements
+        continue
+    if len(record_lines) == 0:
+      if line.startswith(data_element_start_tag):
+        record_lines.append(line)
+        record_size = len(line)
+    elif data_element_end_tag in line:
+      record_lines.append(line)
+      yield joinRecordLines(record_lines), None
+      record_lines = []
+    elif record_max_size == 0 or record_size < record_max_size:
+      record_lines.append(line)
+      record_size = record_size + len(line)
+  if checkpoint is not None:
+    checkpoint["halfline"] = len(record_lines) > 0
+    checkpoint["linecache"] = (joinRecordLines(record_lines) if record_lines else "")
+  elif record_lines:
+    yield joinRecordLines(record_lines), None
+
+class LogElementValues(object):
+  # Records of a log file are kept as tuples and the values of low cardinality data elements (e.g. Severity,
+  # Message Type, http response) are shared between them, so a repeated value is held and pickled by the worker
+  # process only once. Every compact_check_records records the data elements with more than compact_element_values
+  # distinct values (e.g. Message Text) are no longer shared.
+  __slots__ = ["values", "records"]
+
+  def __init__(self):
+    self.values = []
+    self.records = 0
+
+  def compact(self, line_elements):
+    if len(self.values) < len(line_elements):
+      self.values.extend([{} for i in range(len(self.values), len(line_elements))])
+    self.records = self.records + 1
+    if self.records % compact_check_records == 0:
+      self.values = [(values if values is not None and len(values) <= compact_element_values else None) for values in self.values]
+    return tuple([(line_element if values is None else values.setdefault(line_element, line_element)) for line_element, values in zip(line_elements, self.values)])
+
+class LogElementStore(object):
+  # Records of a log file kept in memory up to budget bytes (see getLineElementsSize()), 0 meaning no limit. Beyond
+  # the budget the records held are written as a run to a temporary file and memory starts over. The runs follow
+  # each other in file order, so the records are read back in order one run after the other (see SpooledLogElements).
+  __slots__ = ["budget", "spill_path", "records", "size", "runs", "spilled"]
+
+  def __init__(self, budget, spill_path):
+    self.budget = budget
+    self.spill_path = spill_path
+    self.records = []
+    self.size = 0
+    self.runs = []
+    self.spilled = 0
+
+  def __len__(self):
+    return self.spilled + len(self.records)
+
+  def append(self, line_elements):
+    self.records.append(line_elements)
+    if self.budget > 0:
+      self.size = self.size + getLineElementsSize(line_elements)
+      if self.size > self.budget:
+        self.runs.extend(writeSpooledLogElements(self.records, self.spill_path).segments)
+        self.spilled = self.spilled + len(self.records)
+        self.records, self.size = ([], 0)
+
+  def getLogElements(self):
+    # The records as a list, or as SpooledLogElements holding the names of the run files once records were spilled
+    if len(self.runs) == 0:
+      return self.records
+    return SpooledLogElements(self.runs + [self.records], len(self), self.spilled)
+
+  def discard(self):
+    for run in self.runs:
+      os.remove(run)
+    self.runs = []
+
+def createLogElementStore(record_limit):
+  # Records of a search with a record limit are bounded by the limit and kept in memory
+  config = getConfig()
+  if record_limit is not None and record_limit["order"] == "newest":
+    return collections.deque(maxlen=record_limit["limit"])
+  if record_limit is not None:
+    return []
+  return LogElementStore(config.getInt("processing_info", "result_memory_mb") * 1024 * 1024, config.get("processing_info", "worker_result_path"))
+
+def getLogElements(log_elements):
+  if isinstance(log_elements, LogElementStore):
+    return log_elements.getLogElements()
+  return list(log_elements)
+
+def discardLogElements(log_elements):
+  if isinstance(log_elements, LogElementStore):
+    log_elements.discard()
+
+def addLogElement(log_elements, line_elements, record_limit, element_values):
+  # With a record limit (see streamSearchPage()) only the first record_limit["limit"] records are kept, or the
+  # last ones for the "newest" order (log_elements is then a bounded deque), and record_limit["records"] counts
+  # all matching records. False once no later record is needed so that the log file is not read further.
+  if record_limit is None:
+    log_elements.append(element_values.compact(line_elements))
+    return True
+  record_limit["records"] = record_limit["records"] + 1
+  if record_limit["order"] == "newest":
+    log_elements.append(element_values.compact(line_elements))
+    return True
+  if record_limit["records"] <= record_limit["limit"]:
+    log_elements.append(element_values.compact(line_elements))
+  return record_limit["total"] or record_limit["records"] < record_limit["limit"]
+
+def isSinglelineTag(data_element_tag):
+  return len(data_element_tag) == 0 or len(data_element_tag) == 1 or data_element_tag[:1] == "\\"
+
+def getAgentCommand(log_filename_with_path, log_filetype, keyword_matcher, byte_range, checkpoint, record_limit, time_filter):
+  config = getConfig()
+  search_spec = {}
+  search_spec["log_filename_with_path"] = log_filename_with_path
+  search_spec["byte_range"] = byte_range
+  search_spec["data_element_tag"] = config.get(log_filetype, "data_element_tag")
+  search_spec["number_of_data_elements"] = len(config.getList(log_filetype, "data_element_logmsg_headers"))
+  search_spec["search_keywords"] = keyword_matcher.search_keywords
+  search_spec["search_criteria"] = keyword_matcher.search_criteria
+  search_spec["checkpoint"] = checkpoint
+  search_spec["record_limit"] = record_limit
+  search_spec["time_filter"] = (None if time_filter is None else time_filter.getSearchSpec())
+  search_spec["query"] = (keyword_matcher.getSearchSpec() if isinstance(keyword_matcher, QueryMatcher) else None)
+  search_spec["record_max_size"] = config.getInt("processing_info", "multiline_record_max_kb") * 1024
+  return config.get("processing_info", "remote_python") + " - " + pipes.quote(json.dumps(search_spec))
+
+def searchRemoteLogFile(machine, log_filename_with_path, log_filetype, keyword_matcher, byte_range=None, checkpoint=None, record_limit=None, time_filter=None, read_ahead=None):
+  # Runs LogSearchViewAgent.py on the remote machine so that only the matching records and the keyword
+  # counts are sent back instead of the whole log file. The agent already started by read_ahead (see
+  # LogReadAhead) for the same search of the log file is taken over.
+  remote_command = getAgentCommand(log_filename_with_path, log_filetype, keyword_matcher, byte_range, checkpoint, record_limit, time_filter)
+  log_elements = createLogElementStore(record_limit)
+  element_values = LogElementValues()
+  keyword_count_server = buildKeywordCount(keyword_matcher.search_keywords)
+  agent_output = (None if read_ahead is None else read_ahead.take(("agent", machine, remote_command)))
+  if agent_output is None:
+    with open(agent_script_file) as agent_script:
+      ssh = subprocess.Popen(sshCommand(machine, remote_command), stdin=agent_script, stdout=subprocess.PIPE)
+    agent_output = ssh.stdout
+  try:
+    for frame_header in iter(agent_output.readline, ""):
+      frame_type = frame_header[:1]
+      frame_fields = frame_header[2:].split()
+      if frame_type == "R":
+        element_lengths = [int(frame_field) for frame_field in frame_fields]
+        record = agent_output.read(sum(element_lengths))
+        line_elements = []
+        element_start = 0
+        for element_length in element_lengths:
+          line_elements.append(record[element_start:element_start + element_length])
+          element_start = element_start + element_length
+        log_elements.append(element_values.compact(line_elements))
+      elif frame_type == "K":
+        checkpoint["offset"] = int(frame_fields[0])
+        checkpoint["halfline"] = frame_fields[1] == "1"
+        checkpoint["linecache"] = agent_output.read(int(frame_fields[2]))
+      elif frame_type == "L":
+        record_limit["records"] = int(frame_fields[0])
+      elif frame_type == "C":
+        updateKeywordCount(keyword_count_server, [int(frame_field) for frame_field in frame_fields])
+      elif frame_type == "E":
+        print getProperty("messages", "error_reading_log_file") + " - " + machine + ":" + log_filename_with_path + " - " + frame_header[2:].strip()
         sys.exit()
+  except BaseException:
+    # Runs already spilled are not handed over
+    discardLogElements(log_elements)
+    raise
+  finally:
+    if isinstance(agent_output, ReadAheadStream):
+      agent_output.close()
+    else:
+      ssh.stdout.close()
+      ssh.wait()
+  return getLogElements(log_elements), keyword_count_server
+
+def searchLogFile(machine, log_filename_with_path, log_filetype, keyword_matcher, byte_range=None, checkpoint=None, record_limit=None, time_filter=None, read_ahead=None):
+  # With a time filter (see getTimeFilter()) only the records between its from and to times are kept. The log file
+  # is read from the stream of read_ahead (see LogReadAhead) when there is one for it.
+  config = getConfig()
+  if machine != socket.gethostname() and config.getBoolean("processing_info", "remote_agent"):
+    return searchRemoteLogFile(machine, log_filename_with_path, log_filetype, keyword_matcher, byte_range, checkpoint, record_limit, time_filter, read_ahead)
+  data_element_tag = config.get(log_filetype, "data_element_tag")
+  number_of_data_elements = len(config.getList(log_filetype, "data_element_logmsg_headers"))
+  regex_start_plus_end_tag = getDataElementRegex(data_element_tag)
+  if len(data_element_tag) == 2:
+    regex_start_tag = re.compile(r"" + re.escape(data_element_tag[:1]) + r"(.*?)")
+  keyword_count_server = buildKeywordCount(keyword_matcher.search_keywords)
+  if time_filter is not None and time_filter.sorted and checkpoint is None:
+    # Only the window of the from/to times is read from a log file appended in time order
+    log_file_size = getLogFileSize(machine, log_filename_with_path)
+    if log_file_size is not None:
+      byte_range = seekTimeRange(machine, log_filename_with_path, byte_range, log_file_size, time_filter, lambda line: splitLogLine(line, data_element_tag, regex_start_plus_end_tag))
+      if byte_range[1] is not None and byte_range[0] >= byte_range[1]:
+        return [], keyword_count_server
+  log_elements = createLogElementStore(record_limit)
+  element_values = LogElementValues()
+  try:
+    if isSinglelineTag(data_element_tag):
+      for line in parseSinglelineBlock(machine, log_filename_with_path, regex_start_plus_end_tag, number_of_data_elements, byte_range, keyword_matcher.getPrefilterKeywords(), checkpoint, keyword_matcher, read_ahead):
+        keyword_counts = keyword_matcher.matchLine(line)
+        if keyword_counts is None:
+          continue
+        line_elements = splitLogLine(line, data_element_tag, regex_start_plus_end_tag)
+        if time_filter is not None and not time_filter.matchRecord(line_elements):
+          continue
+        updateKeywordCount(keyword_count_server, keyword_counts)
+        if not addLogElement(log_elements, line_elements, record_limit, element_values):
+          break
+    elif len(data_element_tag) == 2:
+      for line, line_elements in parseMultilineBlock(machine, log_filename_with_path, data_element_tag, regex_start_tag, regex_start_plus_end_tag, number_of_data_elements, byte_range, checkpoint, read_ahead):
+        keyword_counts = keyword_matcher.matchLine(line)
+        if keyword_counts is None:
+          continue
+        if line_elements is None:
+          line_elements = regex_start_plus_end_tag.findall(line)
+          if len(line_elements) != number_of_data_elements:
+            continue
+        if time_filter is not None and not time_filter.matchRecord(line_elements):
+          continue
+        updateKeywordCount(keyword_count_server, keyword_counts)
+        if not addLogElement(log_elements, line_elements, record_limit, element_values):
+          break
+  except BaseException:
+    discardLogElements(log_elements)
+    raise
+  return getLogElements(log_elements), keyword_count_server
 
 def parseLogFileMP(log_files_with_param_list):
   output_list = []
@@ -246,152 +1619,197 @@ def parseLogFileMP(log_files_with_param_list):
   cluster = log_files_with_param_list[2]
   server = log_files_with_param_list[3]
   log_filename = log_files_with_param_list[4]
+  byte_range = log_files_with_param_list[5]
+  checkpoint = log_files_with_param_list[6]
+  record_limit = log_files_with_param_list[7]
   log_filetype = param_list[3]
-  data_element_tag = getProperty(log_filetype, "data_element_tag")
-  number_of_data_elements = len(getProperty(log_filetype, "data_element_logmsg_headers").split(','))
-  search_keywords = param_list[4].split(",")
-  search_criteria = param_list[5]
-  if len(data_element_tag) == 0:
-    regex_start_plus_end_tag = re.compile(r"!.")
-  elif len(data_element_tag) == 1:
-    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_tag) + r"")
-  elif data_element_tag[:1] == "\\":
-    regex_start_plus_end_tag = re.compile(r"" + data_element_tag + r"")
-  elif len(data_element_tag) == 2:
-    data_element_start_tag = data_element_tag[:1]
-    data_element_end_tag = data_element_tag[1:]
-    regex_start_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)")
-    regex_end_tag = re.compile(r"(.*?)" + r"" + re.escape(data_element_end_tag))
-    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)" + r"" + re.escape(data_element_end_tag))  
-  log_elements = []
-  keyword_count_server = []
-  for search_keyword in search_keywords:
-    keyword_count_server.append([search_keyword, 0])
-  if len(data_element_tag) == 0 or len(data_element_tag) == 1 or data_element_tag[:1] == "\\":
-    for line in parseSinglelineBlock(machine, log_filename, regex_start_plus_end_tag, number_of_data_elements):
-      line_elements = []
-      search_found = False
-      if search_criteria == "any":
-        if any(x in line.lower() for x in search_keywords):
-          search_found = True
-      if search_criteria == "all":
-        if all(x in line.lower() for x in search_keywords):
-          search_found = True
-      if search_found:
-        if len(data_element_tag) == 0:
-          line_elements = [line]
-        elif len(data_element_tag) == 1:
-          line_elements = line.split(data_element_tag) 
-        elif data_element_tag[:1] == "\\":
-          line_elements = re.split(regex_start_plus_end_tag, line)
-        log_elements.append(line_elements)
-        keyword_count_server = updateKeywordCount(keyword_count_server, line, search_keywords)
-  elif len(data_element_tag) == 2:
-    for line in parseMultilineBlock(machine, log_filename, regex_start_tag, regex_end_tag, regex_start_plus_end_tag, number_of_data_elements):
-      line_elements = []
-      search_found = False
-      if not data_element_start_tag in line and not data_element_end_tag in line:
-        continue
-      if search_criteria == "any":
-        if any(x in line.lower() for x in search_keywords):
-          search_found = True
-      if search_criteria == "all":
-        if all(x in line.lower() for x in search_keywords):
-          search_found = True
-      if search_found:
-        line_elements = re.findall(regex_start_plus_end_tag, line)
-        if len(line_elements) == number_of_data_elements:
-          log_elements.append(line_elements)
-          keyword_count_server = updateKeywordCount(keyword_count_server, line, search_keywords)
-  if len(log_elements) > 0:
+  keyword_matcher = buildKeywordMatcher(param_list)
+  log_elements, keyword_count_server = searchLogFile(machine, log_filename, log_filetype, keyword_matcher, byte_range, checkpoint, record_limit, getTimeFilter(param_list))
+  if len(log_elements) > 0 or (record_limit is not None and record_limit["records"] > 0):
     all_log_elements.append([param_list[0], machine, cluster, server, log_elements])
     all_keyword_counts.append([param_list[0], machine, cluster, server, keyword_count_server]) 
   output_list.append(all_keyword_counts)
   output_list.append(all_log_elements)
+  # The checkpoint moved and the records counted by the worker go back to the parent process
+  output_list.append(checkpoint)
+  output_list.append(record_limit)
   return output_list
 
-def parseLogFile(param_list):
+def getSpooledRecordStruct(number_of_elements):
+  if not number_of_elements in spooled_record_structs:
+    spooled_record_structs[number_of_elements] = struct.Struct("!H%dI" % number_of_elements)
+  return spooled_record_structs[number_of_elements]
+
+class SpooledLogElements(object):
+  # Matching records handed over by a worker process in a temporary file (see spoolLogFileMP()). The parent process
+  # maps the file and removes it at once (mapFiles()), the records are read from the map while the output is written,
+  # so they are neither unpickled nor held as objects. Records of several byte ranges are kept as segments, a segment
+  # being the file name (before mapFiles()), the map or a list of records. spilled counts the records written to a
+  # file because the search went over result_memory_mb (see LogElementStore and spillLogFileResults()).
+  __slots__ = ["segments", "records", "spilled"]
+
+  def __init__(self, segments, records, spilled=0):
+    self.segments = segments
+    self.records = records
+    self.spilled = spilled
+
+  def __len__(self):
+    return self.records
+
+  def __iter__(self):
+    for segment in self.segments:
+      if isinstance(segment, list):
+        for line_elements in segment:
+          yield line_elements
+        continue
+      offset = 0
+      while offset < len(segment):
+        record_struct = getSpooledRecordStruct(spooled_record_count.unpack_from(segment, offset)[0])
+        element_lengths = record_struct.unpack_from(segment, offset)[1:]
+        offset = offset + record_struct.size
+        line_elements = []
+        for element_length in element_lengths:
+          line_elements.append(segment[offset:offset + element_length])
+          offset = offset + element_length
+        yield tuple(line_elements)
+
+  def extend(self, log_elements):
+    if isinstance(log_elements, SpooledLogElements):
+      self.segments.extend(log_elements.segments)
+      self.spilled = self.spilled + log_elements.spilled
+    else:
+      self.segments.append(log_elements)
+    self.records = self.records + len(log_elements)
+
+  def mapFiles(self):
+    for i in range(len(self.segments)):
+      if isinstance(self.segments[i], basestring):
+        spooled_file = open(self.segments[i], "rb")
+        try:
+          self.segments[i] = mmap.mmap(spooled_file.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+          spooled_file.close()
+          os.remove(spooled_file.name)
+
+  def removeFiles(self):
+    for segment in self.segments:
+      if isinstance(segment, basestring):
+        os.remove(segment)
+
+def writeSpooledLogElements(log_elements, spool_path):
+  spooled_fd, spooled_filename = tempfile.mkstemp(".tmp", "LogSearchView.", spool_path)
+  spooled_file = os.fdopen(spooled_fd, "wb")
+  try:
+    for line_elements in log_elements:
+      spooled_file.write(getSpooledRecordStruct(len(line_elements)).pack(len(line_elements), *[len(line_element) for line_element in line_elements]))
+      spooled_file.write("".join(line_elements))
+    spooled_file.close()
+  except:
+    spooled_file.close()
+    os.remove(spooled_filename)
+    raise
+  return SpooledLogElements([spooled_filename], len(log_elements))
+
+def spoolLogFileMP(log_files_with_param_list):
+  # parseLogFileMP() for streamMultiProcessing(): at least worker_result_file_records matching records are handed
+  # over as SpooledLogElements instead of being pickled through the worker pool
+  output_list = parseLogFileMP(log_files_with_param_list)
+  config = getConfig()
+  worker_result_file_records = config.getInt("processing_info", "worker_result_file_records")
+  if len(output_list[1]) > 0 and isinstance(output_list[1][0][4], list) and worker_result_file_records > 0 and len(output_list[1][0][4]) >= worker_result_file_records:
+    output_list[1][0][4] = writeSpooledLogElements(output_list[1][0][4], config.get("processing_info", "worker_result_path"))
+  return output_list
+
+def mapSpooledLogElements(output_list):
+  # Results of parseLogFileMP() or spoolLogFileMP() taken by the search
+  if len(output_list[1]) > 0 and isinstance(output_list[1][0][4], SpooledLogElements):
+    output_list[1][0][4].mapFiles()
+
+def discardSpooledLogElements(output_list):
+  # Results of parseLogFileMP() or spoolLogFileMP() not taken by the search
+  if len(output_list[1]) > 0 and isinstance(output_list[1][0][4], SpooledLogElements):
+    output_list[1][0][4].removeFiles()
+
+def joinLogElements(log_elements, more_log_elements):
+  # Records of a log file followed by more records of the same log file (list or SpooledLogElements)
+  if isinstance(log_elements, list) and isinstance(more_log_elements, list):
+    log_elements.extend(more_log_elements)
+    return log_elements
+  if isinstance(log_elements, list):
+    log_elements = SpooledLogElements([log_elements], len(log_elements))
+  log_elements.extend(more_log_elements)
+  return log_elements
+
+def getReadAheadKey(machine, log_filename_with_path, log_filetype, keyword_matcher, checkpoint, time_filter):
+  # Stream searchLogFile() reads a whole log file (or the part after checkpoint) from, see LogReadAhead: the output of
+  # the remote agent or the lines from the start offset. None when the part read is only known once the log file is
+  # searched (time range seek) or a local log file is memory mapped.
+  config = getConfig()
+  if machine != socket.gethostname() and config.getBoolean("processing_info", "remote_agent"):
+    return ("agent", machine, getAgentCommand(log_filename_with_path, log_filetype, keyword_matcher, None, checkpoint, None, time_filter))
+  if time_filter is not None and time_filter.sorted and checkpoint is None:
+    return None
+  if isSinglelineTag(config.get(log_filetype, "data_element_tag")) and keyword_matcher.getPrefilterKeywords() is not None and machine == socket.gethostname() and config.getBoolean("processing_info", "mmap_local_files"):
+    return None
+  return ("lines", machine, log_filename_with_path, (0 if checkpoint is None else checkpoint["offset"]))
+
+def streamParseLogFile(param_list, scan_state=None, progress=None):
+  # Yields [file index, keyword counts, log elements] of each log file with matching records as soon as it is searched
+  log_filetype = param_list[3]
+  keyword_matcher = buildKeywordMatcher(param_list)
+  time_filter = getTimeFilter(param_list)
+  log_filenames_with_param_list = getLogFilenames(param_list)
+  openSSHConnections([log_filenames[1] for log_filenames in log_filenames_with_param_list])
+  if scan_state is not None or progress is not None:
+    log_file_stats = getLogFileStats(log_filenames_with_param_list)
+  if progress is not None:
+    for log_file_stat in log_file_stats:
+      if log_file_stat is not None:
+        updateProgress(progress, 1, log_file_stat[1], 0, 0)
+  # Checkpoints are taken up front so that the reader stage reads each log file from its checkpoint
+  checkpoints = [None] * len(log_filenames_with_param_list)
+  if scan_state is not None:
+    for i in range(len(log_filenames_with_param_list)):
+      if log_file_stats[i] is not None:
+        checkpoints[i] = getScanCheckpoint(scan_state, log_filenames_with_param_list[i], log_file_stats[i])
+  read_ahead = None
+  if getConfig().getInt("processing_info", "read_ahead_files") > 0:
+    read_ahead_keys = []
+    for i in range(len(log_filenames_with_param_list)):
+      if scan_state is not None and log_file_stats[i] is None:
+        read_ahead_keys.append(None)
+      else:
+        read_ahead_keys.append(getReadAheadKey(log_filenames_with_param_list[i][1], log_filenames_with_param_list[i][4], log_filetype, keyword_matcher, checkpoints[i], time_filter))
+    read_ahead = LogReadAhead(read_ahead_keys)
+  try:
+    for i in range(len(log_filenames_with_param_list)):
+      machine, cluster, server, log_filename_with_path = log_filenames_with_param_list[i][1:5]
+      env = param_list[0]
+      checkpoint = checkpoints[i]
+      if scan_state is not None and log_file_stats[i] is None:
+        continue
+      if read_ahead is not None:
+        read_ahead.advance(i)
+      log_elements, keyword_count_server = searchLogFile(machine, log_filename_with_path, log_filetype, keyword_matcher, None, checkpoint, None, time_filter, read_ahead)
+      if isinstance(log_elements, SpooledLogElements):
+        log_elements.mapFiles()
+      if checkpoint is not None:
+        updateScanState(scan_state, log_filenames_with_param_list[i], checkpoint)
+      if progress is not None and log_file_stats[i] is not None:
+        updateProgress(progress, 0, 0, 1, log_file_stats[i][1])
+      if len(log_elements) > 0:
+        yield [i, [env, machine, cluster, server, keyword_count_server], [env, machine, cluster, server, log_elements]]
+  finally:
+    if read_ahead is not None:
+      read_ahead.close()
+
+def parseLogFile(param_list, scan_state=None):
   output_list = []
   all_keyword_counts = []
   all_log_elements = []
-  cluster = param_list[1]
-  server = param_list[2]
-  log_filetype = param_list[3]
-  log_filepath_from_property_file = getProperty("log_fileinfo", "log_filepath")
-  log_filename_from_property_file = getProperty(log_filetype, "log_filename")
-  data_element_tag = getProperty(log_filetype, "data_element_tag")
-  number_of_data_elements = len(getProperty(log_filetype, "data_element_logmsg_headers").split(','))
-  search_keywords = param_list[4].split(",")
-  search_criteria = param_list[5]
-  if len(data_element_tag) == 0:
-    regex_start_plus_end_tag = re.compile(r"!.")
-  elif len(data_element_tag) == 1:
-    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_tag) + r"")
-  elif data_element_tag[:1] == "\\":
-    regex_start_plus_end_tag = re.compile(r"" + data_element_tag + r"")
-  elif len(data_element_tag) == 2:
-    data_element_start_tag = data_element_tag[:1]
-    data_element_end_tag = data_element_tag[1:]
-    regex_start_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)")
-    regex_end_tag = re.compile(r"(.*?)" + r"" + re.escape(data_element_end_tag))
-    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)" + r"" + re.escape(data_element_end_tag))
-  if server == "all":
-    machines = getMachines(param_list[0], "cluster", cluster)
-  else:
-    machines = getMachines(param_list[0], "server", server)
-  for machine in machines:
-    if param_list[2] == "all":
-      servers = getProperty(machine, cluster).split(",")
-    else:
-      servers = [server]
-    for server in servers:
-      log_filename_with_path = ""
-      log_elements = []
-      log_filepath = log_filepath_from_property_file.replace("$cluster", cluster).replace("$server", server)
-      log_filename = log_filename_from_property_file.replace("$server", server)
-      log_filename_with_path = log_filepath + log_filename
-      keyword_count_server = []
-      for search_keyword in search_keywords:
-        keyword_count_server.append([search_keyword, 0])
-      if len(data_element_tag) == 0 or len(data_element_tag) == 1 or data_element_tag[:1] == "\\":
-        for line in parseSinglelineBlock(machine, log_filename_with_path, regex_start_plus_end_tag, number_of_data_elements):
-          line_elements = []
-          search_found = False
-          if search_criteria == "any":
-            if any(x in line.lower() for x in search_keywords):
-              search_found = True
-          if search_criteria == "all":
-            if all(x in line.lower() for x in search_keywords):
-              search_found = True
-          if search_found:
-            if len(data_element_tag) == 0:
-              line_elements = [line]
-            elif len(data_element_tag) == 1:
-              line_elements = line.split(data_element_tag) 
-            elif data_element_tag[:1] == "\\":
-              line_elements = re.split(regex_start_plus_end_tag, line)
-            log_elements.append(line_elements)
-            keyword_count_server = updateKeywordCount(keyword_count_server, line, search_keywords)
-      elif len(data_element_tag) == 2:
-        for line in parseMultilineBlock(machine, log_filename_with_path, regex_start_tag, regex_end_tag, regex_start_plus_end_tag, number_of_data_elements):
-          line_elements = []
-          search_found = False
-          if not data_element_start_tag in line and not data_element_end_tag in line:
-            continue
-          if search_criteria == "any":
-            if any(x in line.lower() for x in search_keywords):
-              search_found = True
-          if search_criteria == "all":
-            if all(x in line.lower() for x in search_keywords):
-              search_found = True
-          if search_found:
-            line_elements = re.findall(regex_start_plus_end_tag, line)
-            if len(line_elements) == number_of_data_elements:
-              log_elements.append(line_elements)
-              keyword_count_server = updateKeywordCount(keyword_count_server, line, search_keywords)
-      if len(log_elements) > 0:
-        all_log_elements.append([param_list[0], machine, cluster, server, log_elements])
-        all_keyword_counts.append([param_list[0], machine, cluster, server, keyword_count_server]) 
+  for log_file_result in sorted(spillLogFileResults(streamParseLogFile(param_list, scan_state)), key=lambda x : x[0]):
+    all_keyword_counts.append(log_file_result[1])
+    all_log_elements.append(log_file_result[2])
   output_list.append(sorted(all_keyword_counts, key=lambda x : x[4], reverse=True))
   output_list.append(all_log_elements)
   return output_list
@@ -402,15 +1820,16 @@ def getLogFilenames(param_list):
   cluster = param_list[1]
   server = param_list[2]
   log_filetype = param_list[3]
-  log_filepath_from_property_file = getProperty("log_fileinfo", "log_filepath")
-  log_filename_from_property_file = getProperty(log_filetype, "log_filename")
+  config = getConfig()
+  log_filepath_from_property_file = config.get("log_fileinfo", "log_filepath")
+  log_filename_from_property_file = config.get(log_filetype, "log_filename")
   if server == "all":
     machines = getMachines(env, "cluster", cluster)
   else:
     machines = getMachines(env, "server", server)
   for machine in machines:
     if param_list[2] == "all":
-      servers = getProperty(machine, cluster).split(",")
+      servers = config.getList(machine, cluster)
     else:
       servers = [server]
     for server in servers:
@@ -427,206 +1846,1012 @@ def getLogFilenames(param_list):
       log_filenames_with_param_list.append(log_filenames)
   return log_filenames_with_param_list
 
-def performMultiProcessing(param_list):
+def getLogFileStats(log_filenames_with_param_list):
+  # (inode, size, modification time) of each log file, None for a missing file. Remote files are checked with one
+  # ssh call per machine, the modification time is 0 where stat -c is not available.
+  log_file_stats = [None] * len(log_filenames_with_param_list)
+  remote_log_files = {}
+  for i in range(len(log_filenames_with_param_list)):
+    machine = log_filenames_with_param_list[i][1]
+    log_filename_with_path = log_filenames_with_param_list[i][4]
+    if machine == socket.gethostname():
+      if os.path.isfile(log_filename_with_path):
+        log_file_stat = os.stat(log_filename_with_path)
+        log_file_stats[i] = (log_file_stat.st_ino, log_file_stat.st_size, int(log_file_stat.st_mtime))
+    else:
+      remote_log_files.setdefault(machine, []).append(i)
+  for machine, remote_log_file_ids in remote_log_files.items():
+    remote_commands = []
+    for i in remote_log_file_ids:
+      log_filename_with_path = pipes.quote(log_filenames_with_param_list[i][4])
+      remote_commands.append("if test -f " + log_filename_with_path + "; then stat -c '%i %s %Y' " + log_filename_with_path + " 2>/dev/null || { set -- $(ls -i " + log_filename_with_path + "); echo $1 $(wc -c < " + log_filename_with_path + ") 0; }; else echo -1 -1 -1; fi")
+    ssh = subprocess.Popen(sshCommand(machine, "; ".join(remote_commands)), stdout=subprocess.PIPE)
+    remote_stats = ssh.communicate()[0].split()
+    for j in range(len(remote_log_file_ids)):
+      remote_inode, remote_size, remote_mtime = [int(remote_stat) for remote_stat in remote_stats[3 * j:3 * j + 3]]
+      if remote_size >= 0:
+        log_file_stats[remote_log_file_ids[j]] = (remote_inode, remote_size, remote_mtime)
+  return log_file_stats
+
+def loadScanState():
+  # Checkpoints of previous incremental runs, keyed by getScanStateKey()
+  scan_state_file = getProperty("processing_info", "incremental_state_file")
+  if not os.path.isfile(scan_state_file):
+    return {}
+  try:
+    f = open(scan_state_file)
+    try:
+      scan_state = json.load(f)
+    finally:
+      f.close()
+  except (EnvironmentError, ValueError), e:
+    print getProperty("messages", "error_type") + " " + getProperty("messages", "error_reading_state_file") + " - " + scan_state_file + " - " + str(e)
+    sys.exit()
+  for checkpoint in scan_state.values():
+    checkpoint["linecache"] = checkpoint["linecache"].encode("utf-8")
+  return scan_state
+
+def saveScanState(scan_state):
+  # Written to a temporary file first so that an interrupted run leaves the previous state intact
+  scan_state_file = getProperty("processing_info", "incremental_state_file")
+  f = open(scan_state_file + ".tmp", "w")
+  try:
+    json.dump(scan_state, f)
+  finally:
+    f.close()
+  os.rename(scan_state_file + ".tmp", scan_state_file)
+
+def getScanStateKey(log_filenames):
+  param_list = log_filenames[0]
+  return "|".join([log_filenames[1], log_filenames[4], param_list[3], param_list[4], param_list[5]])
+
+def getScanCheckpoint(scan_state, log_filenames, log_file_stat):
+  # The previous checkpoint of the file is resumed unless the file was rotated (new inode) or truncated
+  # (smaller than the checkpoint offset), then the file is read again from the start
+  inode, size = log_file_stat[:2]
+  checkpoint = scan_state.get(getScanStateKey(log_filenames))
+  if checkpoint is None or checkpoint["inode"] != inode or checkpoint["offset"] > size:
+    checkpoint = {"inode": inode, "offset": 0, "linecache": "", "halfline": False}
+  return dict(checkpoint)
+
+def updateScanState(scan_state, log_filenames, checkpoint):
+  scan_state[getScanStateKey(log_filenames)] = checkpoint
+
+def splitLogFile(log_file_size, split_file_size):
+  # Byte ranges of about split_file_size each, the last one reading up to the end of file
+  byte_ranges = []
+  number_of_ranges = max(1, (log_file_size + split_file_size - 1) / split_file_size)
+  range_size = (log_file_size + number_of_ranges - 1) / number_of_ranges
+  for i in range(number_of_ranges):
+    byte_ranges.append((i * range_size, (i + 1) * range_size))
+  byte_ranges[-1] = (byte_ranges[-1][0], None)
+  return byte_ranges
+
+def initWorkerProcess():
+  # Interrupts are handled by the parent process which shuts the pool down
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def getWorkerCount():
+  cpu_usage = getConfig().getPercent("processing_info", "cpu_usage")
+  return max(1, multiprocessing.cpu_count() * cpu_usage / 100)
+
+def createWorkerPool():
+  worker_count = getWorkerCount()
+  task_queue_size = max(worker_count, getConfig().getInt("processing_info", "task_queue_size"))
+  pool = multiprocessing.Pool(processes=worker_count, initializer=initWorkerProcess)
+  return pool, threading.BoundedSemaphore(task_queue_size)
+
+def startWorkerPool():
+  global worker_pool, worker_pool_slots
+  if worker_pool is None:
+    worker_pool, worker_pool_slots = createWorkerPool()
+
+def stopWorkerPool():
+  global worker_pool, worker_pool_slots
+  pool = worker_pool
+  worker_pool, worker_pool_slots = (None, None)
+  if pool is not None:
+    pool.close()
+    pool.join()
+
+def runWorkerTask(worker_task):
+  task_id, worker_function, task = worker_task
+  try:
+    return task_id, True, worker_function(task)
+  except BaseException, e:
+    return task_id, False, e
+
+def runWorkerTasks(worker_function, tasks, lookahead=None, discard=None):
+  # Yields (task index, result) in completion order. At most task_queue_size tasks of all concurrent
+  # searches are queued on the pool, the remaining ones are submitted as earlier ones complete.
+  # With lookahead at most that many tasks of this search are pending at a time. Results completed
+  # after the caller stopped taking them are passed to discard.
+  pool, slots = (worker_pool, worker_pool_slots)
+  private_pool = pool is None
+  if private_pool:
+    pool, slots = createWorkerPool()
+  results = Queue.Queue()
+  results_lock = threading.Lock()
+  results_closed = [False]
+  def completeTask(result):
+    slots.release()
+    results_lock.acquire()
+    try:
+      if not results_closed[0]:
+        results.put(result)
+        return
+    finally:
+      results_lock.release()
+    if discard is not None and result[1]:
+      discard(result[2])
+  completed = False
+  try:
+    next_task, pending_tasks = (0, 0)
+    while next_task < len(tasks) or pending_tasks > 0:
+      while next_task < len(tasks) and (lookahead is None or pending_tasks < lookahead) and slots.acquire(pending_tasks == 0):
+        pool.apply_async(runWorkerTask, ((next_task, worker_function, tasks[next_task]),), callback=completeTask)
+        next_task, pending_tasks = (next_task + 1, pending_tasks + 1)
+      task_id, succeeded, result = results.get()
+      pending_tasks = pending_tasks - 1
+      if not succeeded:
+        raise result
+      yield task_id, result
+    completed = True
+  except GeneratorExit:
+    # The caller needs no more results (e.g. a full page): the pending tasks are left to complete
+    # rather than terminating the pool under them
+    completed = True
+    raise
+  finally:
+    results_lock.acquire()
+    try:
+      results_closed[0] = True
+    finally:
+      results_lock.release()
+    while not results.empty():
+      task_id, succeeded, result = results.get()
+      if discard is not None and succeeded:
+        discard(result)
+    if private_pool:
+      if completed:
+        pool.close()
+      else:
+        pool.terminate()
+      pool.join()
+
+def mergeLogFilePart(log_file_result, log_file_part):
+  # Adds the keyword counts and log elements of a searched byte range to log_file_result [keyword counts, log elements]
+  if len(log_file_part[0]) == 0:
+    return
+  if len(log_file_result) == 0:
+    log_file_result.append(log_file_part[0][0][:4] + [buildKeywordCount([keyword_count[0] for keyword_count in log_file_part[0][0][4]])])
+    log_file_result.append(log_file_part[1][0][:4] + [[]])
+  updateKeywordCount(log_file_result[0][4], [keyword_count[1] for keyword_count in log_file_part[0][0][4]])
+  log_file_result[1][4] = joinLogElements(log_file_result[1][4], log_file_part[1][0][4])
+
+def mergeLogFileParts(log_file_parts):
+  log_file_result = []
+  for log_file_part in log_file_parts:
+    mergeLogFilePart(log_file_result, log_file_part)
+  if len(log_file_result) == 0:
+    return [[], []]
+  return [[log_file_result[0]], [log_file_result[1]]]
+
+def streamMultiProcessing(param_list, scan_state=None, progress=None):
+  # Yields [file index, keyword counts, log elements] of each log file with matching records as soon as
+  # all byte ranges of the log file are searched by the worker processes
+  config = getConfig()
+  log_filenames_with_param_list = getLogFilenames(param_list)
+  openSSHConnections([log_filenames[1] for log_filenames in log_filenames_with_param_list])
+  log_file_stats = getLogFileStats(log_filenames_with_param_list)
+  split_file_size = config.getInt("processing_info", "split_file_size_mb") * 1024 * 1024
+  # Schedule the largest files (or byte ranges of oversized files) first so that the pool is never
+  # left waiting on a big file started last. Missing files are not scheduled at all.
+  # An incremental scan reads each file from its checkpoint in one task.
+  # The byte ranges of a log file are merged as they complete, as far as all earlier byte ranges are
+  # merged: log_file_merges[i] is [merged result, number of merged byte ranges, completed byte ranges]
+  scheduled_tasks = []
+  log_file_merges = []
+  pending_log_file_parts = []
+  for i in range(len(log_filenames_with_param_list)):
+    log_file_merges.append([[], 0, {}])
+    pending_log_file_parts.append(0)
+    if log_file_stats[i] is None:
+      continue
+    log_file_size = log_file_stats[i][1]
+    checkpoint = None
+    if scan_state is not None:
+      checkpoint = getScanCheckpoint(scan_state, log_filenames_with_param_list[i], log_file_stats[i])
+      byte_ranges = [None]
+      log_file_size = log_file_size - checkpoint["offset"]
+    elif log_file_size > split_file_size:
+      byte_ranges = splitLogFile(log_file_size, split_file_size)
+    else:
+      byte_ranges = [None]
+    for j in range(len(byte_ranges)):
+      pending_log_file_parts[i] = pending_log_file_parts[i] + 1
+      if byte_ranges[j] is None:
+        task_size = log_file_size
+      elif byte_ranges[j][1] is None:
+        task_size = log_file_size - byte_ranges[j][0]
+      else:
+        task_size = byte_ranges[j][1] - byte_ranges[j][0]
+      scheduled_tasks.append((-task_size, i, j, log_filenames_with_param_list[i] + [byte_ranges[j], checkpoint, None]))
+    updateProgress(progress, 1, log_file_size, 0, 0)
+  scheduled_tasks.sort()
+  for task_id, output_list_MP_for_each_task in runWorkerTasks(spoolLogFileMP, [scheduled_task[3] for scheduled_task in scheduled_tasks], None, discardSpooledLogElements):
+    i, j = scheduled_tasks[task_id][1:3]
+    mapSpooledLogElements(output_list_MP_for_each_task)
+    log_file_result, merged_parts, log_file_parts = log_file_merges[i]
+    log_file_parts[j] = output_list_MP_for_each_task
+    # Join the byte ranges of the log file back in file order
+    while merged_parts in log_file_parts:
+      mergeLogFilePart(log_file_result, log_file_parts.pop(merged_parts))
+      merged_parts = merged_parts + 1
+    log_file_merges[i][1] = merged_parts
+    pending_log_file_parts[i] = pending_log_file_parts[i] - 1
+    if scan_state is not None:
+      updateScanState(scan_state, log_filenames_with_param_list[i], output_list_MP_for_each_task[2])
+    updateProgress(progress, 0, 0, (1 if pending_log_file_parts[i] == 0 else 0), -scheduled_tasks[task_id][0])
+    if pending_log_file_parts[i] == 0:
+      log_file_merges[i] = None
+      if len(log_file_result) > 0:
+        yield [i] + log_file_result
+
+def getLogFileResultOrder(log_file_result):
+  # Sort key of [file index, keyword counts, ...]: descending keyword counts, then log file order
+  return ([-keyword_count[1] for keyword_count in log_file_result[1][4]], log_file_result[0])
+
+def mergeLogFileResults(log_file_results):
+  # Collects the results of the log files in a dict keyed by (machine, cluster, server) as they complete, results
+  # of the same server are added up, and returns them in getLogFileResultOrder() taken from a heap
+  partial_results = {}
+  for log_file_result in log_file_results:
+    server_key = tuple(log_file_result[1][1:4])
+    partial_result = partial_results.get(server_key)
+    if partial_result is None:
+      partial_results[server_key] = log_file_result
+      continue
+    updateKeywordCount(partial_result[1][4], [keyword_count[1] for keyword_count in log_file_result[1][4]])
+    partial_result[2][4] = joinLogElements(partial_result[2][4], log_file_result[2][4])
+  result_heap = [(getLogFileResultOrder(partial_result), server_key) for server_key, partial_result in partial_results.iteritems()]
+  heapq.heapify(result_heap)
+  while result_heap:
+    yield partial_results.pop(heapq.heappop(result_heap)[1])
+
+def performMultiProcessing(param_list, scan_state=None):
   output_list_keyword_count = []
   output_list_log_data = []
   output_list = []
-  output_list_MP_for_all_processes = []
-  output_list_keyword_count_servers_sorted = []
-  output_list_log_data_sorted = []
-  log_filenames_with_param_list = getLogFilenames(param_list)
-     
-  cpu_usage = int(getProperty("processing_info", "cpu_usage")[:-1])
-  cpu_counts = multiprocessing.cpu_count()*cpu_usage/100
-  # Divide Log files based on cpu_counts for multi processing.
-  log_filenames_for_processes = [log_filenames_with_param_list[i:i+cpu_counts] for i in range(0, len(log_filenames_with_param_list), cpu_counts)]
-  for log_filenames_for_each_process in log_filenames_for_processes:
-    output_list_MP_for_each_process = []
-    pool = multiprocessing.Pool(processes=len(log_filenames_for_each_process))
-    output_list_MP_for_each_process = pool.map(parseLogFileMP, log_filenames_for_each_process)
-    pool.close()
-    pool.join()
-    output_list_MP_for_all_processes.append(output_list_MP_for_each_process)
-  # Extract Keyword counts
-  for output_list_MP_for_all_process in output_list_MP_for_all_processes:
-    for output_list_MP_for_all_process_row in output_list_MP_for_all_process:
-      if len(output_list_MP_for_all_process_row[0]) > 0:
-        output_list_keyword_count.append(output_list_MP_for_all_process_row[0][0])
-  # Sort Keyword count list in descending order
-  output_list_keyword_count_sorted = sorted(output_list_keyword_count, key=lambda x : x[4], reverse=True)
-  output_list.append(output_list_keyword_count_sorted)
-  for output_list_keyword_count_sorted_item in output_list_keyword_count_sorted:
-    output_list_keyword_count_servers_sorted.append(output_list_keyword_count_sorted_item[3])
-  for output_list_MP_for_all_process in output_list_MP_for_all_processes:
-    for output_list_MP_for_all_process_row in output_list_MP_for_all_process:
-      if len(output_list_MP_for_all_process_row[0]) > 0:
-        for i in range(len(output_list_MP_for_all_process_row[1])):
-          output_list_log_data.append(output_list_MP_for_all_process_row[1][i]) 
-  # Arrange Log Data as per the sorted order of Keyword Counts
-  for output_list_keyword_count_server_sorted in output_list_keyword_count_servers_sorted:
-    idx = next((i for i, sublist in enumerate(output_list_log_data) if output_list_keyword_count_server_sorted in sublist), -1)
-    output_list_log_data_sorted.append(output_list_log_data[idx])
-  output_list.append(output_list_log_data_sorted)
+  # Keyword counts in descending order and the Log Data of the same servers in the same order
+  for log_file_result in mergeLogFileResults(spillLogFileResults(streamMultiProcessing(param_list, scan_state))):
+    output_list_keyword_count.append(log_file_result[1])
+    output_list_log_data.append(log_file_result[2])
+  output_list.append(output_list_keyword_count)
+  output_list.append(output_list_log_data)
   return output_list
 
-def performProcessingLogData(param_list):
+def streamProcessingLogData(param_list, scan_state=None, progress=None):
+  # Results of performProcessingLogData() per log file in completion order, see streamParseLogFile(). With progress
+  # (see updateProgress()) the log files and bytes to search and searched so far are counted while searching.
+  if result_cache is not None and scan_state is None and getTimeFilter(param_list) is None:
+    # Cached results hold all the records of a log file, a from/to search only reads the window of its times
+    return spillLogFileResults(streamCachedLogData(param_list, progress))
+  if getConfig().getBoolean("processing_info", "multi_processing"):
+    return spillLogFileResults(streamMultiProcessing(param_list, scan_state, progress))
+  else:
+    return spillLogFileResults(streamParseLogFile(param_list, scan_state, progress))
+
+def updateProgress(progress, files, size, files_done, size_done):
+  # Adds log files and bytes to search and searched to progress {"files", "bytes", "files_done", "bytes_done"}
+  if progress is None:
+    return
+  progress["files"] = progress["files"] + files
+  progress["bytes"] = progress["bytes"] + size
+  progress["files_done"] = progress["files_done"] + files_done
+  progress["bytes_done"] = progress["bytes_done"] + size_done
+
+def spillLogFileResults(log_file_results):
+  # Passes [file index, keyword counts, log elements] through while keeping the records the search holds in memory
+  # within result_memory_mb: the records of a log file which would go over it are written to a temporary file and
+  # read back from a memory map (see SpooledLogElements). The records of a log file are in file order and the output
+  # order of the log files is kept, so no merge of the spilled runs is needed to read them back in order.
+  config = getConfig()
+  budget = config.getInt("processing_info", "result_memory_mb") * 1024 * 1024
+  spill_path = config.get("processing_info", "worker_result_path")
+  log_elements_size = 0
+  for log_file_result in log_file_results:
+    log_elements = log_file_result[2][4]
+    if budget > 0 and isinstance(log_elements, list):
+      records_size = getLogElementsSize(log_elements)
+      if log_elements_size + records_size > budget:
+        spilled_log_elements = writeSpooledLogElements(log_elements, spill_path)
+        spilled_log_elements.spilled = len(log_elements)
+        spilled_log_elements.mapFiles()
+        log_file_result[2][4] = spilled_log_elements
+      else:
+        log_elements_size = log_elements_size + records_size
+    yield log_file_result
+
+def getSpilledRecords(log_elements):
+  # Records kept on disk for result_memory_mb, reported with the output
+  if isinstance(log_elements, SpooledLogElements):
+    return log_elements.spilled
+  return 0
+
+def performProcessingLogData(param_list, scan_state=None):
   output_list = []
-  multi_processing = getProperty("processing_info", "multi_processing").lower()
-  if multi_processing == "yes":
-    output_list = performMultiProcessing(param_list)
+  if getConfig().getBoolean("processing_info", "multi_processing"):
+    output_list = performMultiProcessing(param_list, scan_state)
   else:
-    output_list = parseLogFile(param_list)
+    output_list = parseLogFile(param_list, scan_state)
   return output_list
 
-def buildHTMLOutput(param_list, output_list, invokedFromWeb):
-  html_message = ""
-  html_message_count_body = ""
-  html_message_data_body = ""
-  processing_time = "$processing_time"
-  log_filetype = param_list[3]
-  search_keywords = param_list[4].split(",")
-  search_criteria = param_list[5]
-  all_keyword_counts = output_list[0]
-  all_log_elements = output_list[1]
-  data_element_fixed_headers = getProperty("log_fileinfo", "data_element_fixed_headers").split(",")
-  data_element_logmsg_headers = getProperty(log_filetype, "data_element_logmsg_headers").split(",")
-  data_element_count_headers = getProperty("log_fileinfo", "data_element_count_headers").split(",")
-  output_filename = getProperty("log_fileinfo", "output_filename")
+class ResultCache(object):
+  # Search results of single log files, keyed by getScanStateKey(). An entry holds the log file identity
+  # (inode, size, modification time) it was searched at, the checkpoint where the search stopped and the
+  # keyword counts and matching records. The least recently used entries are dropped beyond budget bytes
+  # of records and an entry is searched again from the start ttl seconds after it was first stored.
+
+  def __init__(self, budget, ttl):
+    self.budget = budget
+    self.ttl = ttl
+    self.size = 0
+    self.entries = {}
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    self.lock.acquire()
+    try:
+      entry = self.entries.get(key)
+      if entry is not None and time.time() - entry["stored"] > self.ttl:
+        self.discard(key)
+        entry = None
+      if entry is not None:
+        entry["used"] = time.time()
+      return entry
+    finally:
+      self.lock.release()
+
+  def put(self, key, entry):
+    self.lock.acquire()
+    try:
+      self.discard(key)
+      if entry["size"] > self.budget:
+        return
+      entry["used"] = time.time()
+      self.entries[key] = entry
+      self.size = self.size + entry["size"]
+      while self.size > self.budget:
+        self.discard(min(self.entries, key=lambda x : self.entries[x]["used"]))
+    finally:
+      self.lock.release()
+
+  def discard(self, key):
+    # Called with the lock held
+    entry = self.entries.pop(key, None)
+    if entry is not None:
+      self.size = self.size - entry["size"]
+
+  def remove(self, key):
+    self.lock.acquire()
+    try:
+      self.discard(key)
+    finally:
+      self.lock.release()
+
+def startResultCache():
+  global result_cache
+  config = getConfig()
+  if result_cache is None and config.getInt("http_server", "result_cache_mb") > 0:
+    result_cache = ResultCache(config.getInt("http_server", "result_cache_mb") * 1024 * 1024, config.getInt("http_server", "result_cache_ttl"))
+
+def getLineElementsSize(line_elements):
+  # Approximate memory taken by a record, 64 bytes of overhead per record and data element
+  return 64 * (len(line_elements) + 1) + sum([len(line_element) for line_element in line_elements])
+
+def getLogElementsSize(log_elements):
+  log_elements_size = 0
+  for line_elements in log_elements:
+    log_elements_size = log_elements_size + getLineElementsSize(line_elements)
+  return log_elements_size
+
+def streamCachedLogData(param_list, progress=None):
+  # Same results as streamProcessingLogData() kept in result_cache: an unchanged log file is not read again, a
+  # log file which only grew (same inode, larger size) is read from the checkpoint of the cached entry and the
+  # new records are added to the cached ones, other log files are searched from the start. Every search is a
+  # checkpoint search (see getScanCheckpoint()), so a last line or record still being written is left out.
+  env = param_list[0]
+  log_filenames_with_param_list = getLogFilenames(param_list)
+  openSSHConnections([log_filenames[1] for log_filenames in log_filenames_with_param_list])
+  log_file_stats = getLogFileStats(log_filenames_with_param_list)
+  scheduled_tasks = []
+  for i in range(len(log_filenames_with_param_list)):
+    machine, cluster, server = log_filenames_with_param_list[i][1:4]
+    cache_key = getScanStateKey(log_filenames_with_param_list[i])
+    log_file_stat = log_file_stats[i]
+    if log_file_stat is None:
+      result_cache.remove(cache_key)
+      continue
+    entry = result_cache.get(cache_key)
+    if entry is not None and entry["stat"] == log_file_stat:
+      updateProgress(progress, 1, 0, 1, 0)
+      if len(entry["log_elements"]) > 0:
+        yield [i, [env, machine, cluster, server, entry["keyword_count"]], [env, machine, cluster, server, entry["log_elements"]]]
+      continue
+    if entry is None or entry["stat"][0] != log_file_stat[0] or entry["stat"][1] >= log_file_stat[1]:
+      # Rotated, truncated or rewritten in place
+      entry = None
+      checkpoint = {"inode": log_file_stat[0], "offset": 0, "linecache": "", "halfline": False}
+    else:
+      checkpoint = dict(entry["checkpoint"])
+    task_size = log_file_stat[1] - checkpoint["offset"]
+    scheduled_tasks.append((-task_size, i, entry, log_filenames_with_param_list[i] + [None, checkpoint, None]))
+    updateProgress(progress, 1, task_size, 0, 0)
+  # Largest searches first as in streamMultiProcessing()
+  scheduled_tasks.sort()
+  if getConfig().getBoolean("processing_info", "multi_processing"):
+    task_results = runWorkerTasks(parseLogFileMP, [scheduled_task[3] for scheduled_task in scheduled_tasks], None, discardSpooledLogElements)
+  else:
+    task_results = ((j, parseLogFileMP(scheduled_tasks[j][3])) for j in range(len(scheduled_tasks)))
+  for task_id, output_list_MP_for_each_task in task_results:
+    mapSpooledLogElements(output_list_MP_for_each_task)
+    i, entry = scheduled_tasks[task_id][1:3]
+    updateProgress(progress, 0, 0, 1, -scheduled_tasks[task_id][0])
+    machine, cluster, server = log_filenames_with_param_list[i][1:4]
+    all_keyword_counts, all_log_elements, checkpoint = output_list_MP_for_each_task[:3]
+    keyword_count_server = buildKeywordCount(buildKeywordMatcher(param_list).search_keywords)
+    log_elements = []
+    log_elements_size = 0
+    if entry is not None:
+      updateKeywordCount(keyword_count_server, [keyword_count[1] for keyword_count in entry["keyword_count"]])
+      log_elements = entry["log_elements"]
+      log_elements_size = entry["size"]
+    if len(all_keyword_counts) > 0:
+      updateKeywordCount(keyword_count_server, [keyword_count[1] for keyword_count in all_keyword_counts[0][4]])
+      # A new list, the cached one may still be sent by another request
+      log_elements = joinLogElements(list(log_elements), all_log_elements[0][4])
+      if isinstance(all_log_elements[0][4], list):
+        log_elements_size = log_elements_size + getLogElementsSize(all_log_elements[0][4])
+    if isinstance(log_elements, SpooledLogElements):
+      # Records spilled for result_memory_mb are not kept in memory by the cache either
+      result_cache.remove(getScanStateKey(log_filenames_with_param_list[i]))
+    else:
+      new_entry = {"stat": log_file_stats[i], "checkpoint": checkpoint, "keyword_count": keyword_count_server, "log_elements": log_elements, "size": log_elements_size}
+      new_entry["stored"] = (entry["stored"] if entry is not None else time.time())
+      result_cache.put(getScanStateKey(log_filenames_with_param_list[i]), new_entry)
+    if len(log_elements) > 0:
+      yield [i, [env, machine, cluster, server, keyword_count_server], [env, machine, cluster, server, log_elements]]
+
+class SearchFlight(object):
+  # One search run in its own thread for all the requests asking for it, see joinSearch(). The results are
+  # kept so that a request joining late first gets the results found so far. The search is stopped when
+  # no request reads it any more.
+
+  def __init__(self, search_key, log_file_results):
+    self.search_key = search_key
+    self.log_file_results = log_file_results
+    self.results = []
+    self.readers = 0
+    self.finished = False
+    self.error = None
+    self.condition = threading.Condition(search_flights_lock)
+
+  def run(self):
+    try:
+      try:
+        for log_file_result in self.log_file_results:
+          self.condition.acquire()
+          try:
+            if self.readers == 0:
+              # Left by every request: later requests start a new search
+              self.leave()
+              break
+            self.results.append(log_file_result)
+            self.condition.notifyAll()
+          finally:
+            self.condition.release()
+      finally:
+        self.log_file_results.close()
+    except BaseException, e:
+      # e.g. SystemExit on a log file read error, raised again in the requests
+      self.error = e
+    self.condition.acquire()
+    try:
+      self.leave()
+      self.finished = True
+      self.condition.notifyAll()
+    finally:
+      self.condition.release()
+
+  def leave(self):
+    # Called with the lock held
+    if search_flights.get(self.search_key) is self:
+      del search_flights[self.search_key]
+
+  def read(self):
+    position = 0
+    try:
+      while True:
+        self.condition.acquire()
+        try:
+          while position == len(self.results) and not self.finished:
+            self.condition.wait()
+          if position == len(self.results):
+            if self.error is not None:
+              raise self.error
+            return
+          log_file_result = self.results[position]
+        finally:
+          self.condition.release()
+        position = position + 1
+        yield log_file_result
+    finally:
+      self.condition.acquire()
+      try:
+        self.readers = self.readers - 1
+      finally:
+        self.condition.release()
+
+def joinSearch(param_list):
+  # Results of streamProcessingLogData() for a request of a long running process (e.g. the web server).
+  # A request for a search which is already running attaches to it instead of searching the log files again.
+  search_key = "|".join(param_list[:6] + [str(getSearchOption(param_list, name)) for name in ["from", "to"]])
+  search_flights_lock.acquire()
+  try:
+    flight = search_flights.get(search_key)
+    if flight is None:
+      flight = SearchFlight(search_key, streamProcessingLogData(param_list))
+      search_flights[search_key] = flight
+      flight_thread = threading.Thread(target=flight.run)
+      flight_thread.daemon = True
+      flight_thread.start()
+    flight.readers = flight.readers + 1
+  finally:
+    search_flights_lock.release()
+  return flight.read()
+
+class SearchJob(object):
+  # A search run in the background for the job API of a long running process, see submitSearchJob(). The results
+  # are kept as they are found together with the progress of the search, so that a client can follow the search,
+  # read the results found so far or cancel it. The job is "queued" while it waits for one of search_slots, then
+  # "running" and "finished", "cancelled" or "failed".
+
+  def __init__(self, job_id, param_list, search_slots):
+    self.job_id = job_id
+    self.param_list = param_list
+    self.search_slots = search_slots
+    self.state = "queued"
+    self.progress = {"files": 0, "bytes": 0, "files_done": 0, "bytes_done": 0}
+    self.records = 0
+    self.results = []
+    self.error = None
+    self.cancelled = False
+    self.submitted_time = time.time()
+    self.started_time = None
+    self.finished_time = None
+    self.condition = threading.Condition()
+
+  def run(self):
+    if self.search_slots is not None and not self.search_slots.acquire(float("inf"), lambda: not self.cancelled):
+      self.finish("cancelled")
+      return
+    state = "finished"
+    try:
+      try:
+        self.started_time = time.time()
+        self.state = "running"
+        log_file_results = streamProcessingLogData(self.param_list, None, self.progress)
+        try:
+          for log_file_result in log_file_results:
+            self.condition.acquire()
+            try:
+              self.results.append(log_file_result)
+              self.records = self.records + len(log_file_result[2][4])
+              self.condition.notifyAll()
+            finally:
+              self.condition.release()
+            if self.cancelled:
+              break
+        finally:
+          log_file_results.close()
+        if self.cancelled:
+          state = "cancelled"
+      except BaseException, e:
+        # e.g. SystemExit on a log file read error
+        self.error = e
+        state = "failed"
+    finally:
+      if self.search_slots is not None:
+        self.search_slots.release()
+    self.finish(state)
+
+  def finish(self, state):
+    self.condition.acquire()
+    try:
+      self.state = state
+      self.finished_time = time.time()
+      self.condition.notifyAll()
+    finally:
+      self.condition.release()
+
+  def cancel(self):
+    # The search stops after the log file being searched
+    self.cancelled = True
+
+  def getStatus(self):
+    status = dict(self.progress)
+    status["job_id"] = self.job_id
+    status["state"] = self.state
+    status["records"] = self.records
+    status["error"] = (None if self.error is None else str(self.error))
+    status["elapsed"] = None
+    status["eta"] = None
+    if self.started_time is not None:
+      status["elapsed"] = round((self.finished_time or time.time()) - self.started_time, 1)
+      if self.state == "running" and status["bytes_done"] > 0:
+        status["eta"] = round(status["elapsed"] * (status["bytes"] - status["bytes_done"]) / status["bytes_done"], 1)
+    return status
+
+  def getResults(self):
+    # Results found so far, in the order they were found
+    self.condition.acquire()
+    try:
+      return list(self.results)
+    finally:
+      self.condition.release()
+
+  def waitForResults(self, results, timeout):
+    # Waits up to timeout seconds for more than results results or the end of the job
+    self.condition.acquire()
+    try:
+      if len(self.results) == results and self.finished_time is None:
+        self.condition.wait(timeout)
+    finally:
+      self.condition.release()
+
+def submitSearchJob(param_list, search_slots=None):
+  # Starts a SearchJob, None when search_job_max jobs are kept already. search_slots (an object with acquire(deadline,
+  # isWaiting) and release()) bounds the jobs searching at a time.
+  expireSearchJobs()
+  search_jobs_lock.acquire()
+  try:
+    if len(search_jobs) >= getConfig().getInt("http_server", "search_job_max"):
+      return None
+    job = SearchJob(uuid.uuid4().hex, param_list, search_slots)
+    search_jobs[job.job_id] = job
+  finally:
+    search_jobs_lock.release()
+  job_thread = threading.Thread(target=job.run)
+  job_thread.daemon = True
+  job_thread.start()
+  return job
+
+def getSearchJob(job_id):
+  expireSearchJobs()
+  search_jobs_lock.acquire()
+  try:
+    return search_jobs.get(job_id)
+  finally:
+    search_jobs_lock.release()
+
+def removeSearchJob(job_id):
+  # Cancels a job and forgets it once it is no longer searching
+  job = getSearchJob(job_id)
+  if job is None:
+    return None
+  job.cancel()
+  if job.finished_time is not None:
+    search_jobs_lock.acquire()
+    try:
+      search_jobs.pop(job_id, None)
+    finally:
+      search_jobs_lock.release()
+  return job
+
+def expireSearchJobs():
+  # Jobs are kept search_job_ttl seconds after they finished
+  search_job_ttl = getConfig().getInt("http_server", "search_job_ttl")
+  search_jobs_lock.acquire()
+  try:
+    for job_id, job in search_jobs.items():
+      if job.finished_time is not None and time.time() - job.finished_time > search_job_ttl:
+        del search_jobs[job_id]
+  finally:
+    search_jobs_lock.release()
+
+def orderWorkerResults(task_results):
+  # (task index, result) of runWorkerTasks() in task order
+  completed_tasks = {}
+  next_task = 0
+  for task_id, task_result in task_results:
+    completed_tasks[task_id] = task_result
+    while next_task in completed_tasks:
+      yield next_task, completed_tasks.pop(next_task)
+      next_task = next_task + 1
+
+def buildPageCursor(order, log_file_id, log_file_records):
+  return "%s.%d.%d" % (order, log_file_id, log_file_records)
+
+def parsePageCursor(cursor, order):
+  # (log file index, records of the log file already returned) of a cursor of the same order, None if invalid
+  cursor_fields = cursor.split(".")
+  if len(cursor_fields) != 3 or cursor_fields[0] != order or not cursor_fields[1].isdigit() or not cursor_fields[2].isdigit():
+    return None
+  return int(cursor_fields[1]), int(cursor_fields[2])
+
+def streamSearchPage(param_list, page):
+  # Yields [file index, keyword counts, log elements] of the log files holding the records of one page: page["limit"]
+  # records after the first page["offset"] records, or after the position of page["cursor"]. Records are ordered by
+  # log file and by position in the log file, the "newest" order takes both the other way round. The byte ranges of
+  # the log files are searched in that order with at most one pending task per worker, and the search stops reading
+  # as soon as the page is full, the keyword counts then only cover the records read. With page["total"] all log
+  # files are read in full and page["total_records"] is the number of matching records. page["records"] is the
+  # number of records of the page and page["next_cursor"] the position of the next page (None after the last one).
+  config = getConfig()
+  log_filenames_with_param_list = getLogFilenames(param_list)
+  openSSHConnections([log_filenames[1] for log_filenames in log_filenames_with_param_list])
+  log_file_stats = getLogFileStats(log_filenames_with_param_list)
+  split_file_size = config.getInt("processing_info", "split_file_size_mb") * 1024 * 1024
+  log_file_order = range(len(log_filenames_with_param_list))
+  if page["order"] == "newest":
+    log_file_order.reverse()
+  if page["cursor"] is not None:
+    start_log_file_id, skip_records = parsePageCursor(page["cursor"], page["order"])
+  else:
+    start_log_file_id, skip_records = (log_file_order[:1] or [None])[0], page["offset"]
+  if start_log_file_id in log_file_order:
+    start_position = log_file_order.index(start_log_file_id)
+  else:
+    start_position = len(log_file_order)
+  # Log files before the start position are only read for the total counts
+  tasks = []
+  for position in range(len(log_file_order)):
+    i = log_file_order[position]
+    if log_file_stats[i] is None or (position < start_position and not page["total"]):
+      continue
+    log_file_size = log_file_stats[i][1]
+    if log_file_size > split_file_size:
+      byte_ranges = splitLogFile(log_file_size, split_file_size)
+    else:
+      byte_ranges = [None]
+    if page["order"] == "newest":
+      byte_ranges.reverse()
+    record_limit_size = (skip_records + page["limit"] if position >= start_position else 0)
+    for byte_range in byte_ranges:
+      record_limit = {"limit": record_limit_size, "order": page["order"], "total": page["total"], "records": 0}
+      tasks.append((i, log_filenames_with_param_list[i] + [byte_range, None, record_limit]))
+  if config.getBoolean("processing_info", "multi_processing"):
+    task_results = runWorkerTasks(parseLogFileMP, [task[1] for task in tasks], getWorkerCount())
+  else:
+    task_results = ((j, parseLogFileMP(tasks[j][1])) for j in range(len(tasks)))
+  page_records, total_records, log_file_records = (0, 0, 0)
+  next_cursor = None
+  more_records = False
+  log_file_parts = []
+  try:
+    for task_id, task_result in orderWorkerResults(task_results):
+      i = tasks[task_id][0]
+      if len(log_file_parts) > 0 and tasks[task_id - 1][0] != i:
+        all_keyword_counts, all_log_elements = mergeLogFileParts(log_file_parts)
+        if len(all_keyword_counts) > 0:
+          yield [tasks[task_id - 1][0], all_keyword_counts[0], all_log_elements[0]]
+        log_file_parts, log_file_records = ([], 0)
+      record_limit = task_result[3]
+      total_records = total_records + record_limit["records"]
+      if len(task_result[1]) > 0:
+        log_elements = task_result[1][0][4]
+        if page["order"] == "newest":
+          log_elements.reverse()
+        skipped_records = min(skip_records, len(log_elements))
+        skip_records = skip_records - skipped_records
+        page_log_elements = log_elements[skipped_records:skipped_records + page["limit"] - page_records]
+        task_result[1][0][4] = page_log_elements
+        page_records = page_records + len(page_log_elements)
+        log_file_records = log_file_records + skipped_records + len(page_log_elements)
+        if record_limit["limit"] > 0 and record_limit["records"] > skipped_records + len(page_log_elements):
+          more_records = True
+      log_file_parts.append(task_result)
+      if page_records == page["limit"]:
+        if next_cursor is None:
+          next_cursor = buildPageCursor(page["order"], i, log_file_records)
+        if not page["total"]:
+          more_records = True
+          break
+    if len(log_file_parts) > 0:
+      all_keyword_counts, all_log_elements = mergeLogFileParts(log_file_parts)
+      if len(all_keyword_counts) > 0:
+        yield [i, all_keyword_counts[0], all_log_elements[0]]
+  finally:
+    task_results.close()
+  page["records"] = page_records
+  page["next_cursor"] = (next_cursor if more_records else None)
+  if page["total"]:
+    page["total_records"] = total_records
+
+def buildHTMLHeader(param_list, invokedFromWeb, processing_time):
+  config = getConfig()
   global input_param_env, input_param_cluster_name, input_param_server_name, input_param_log_file_type, input_param_search_keywords, input_param_search_criteria
   html_message = """\
     <html>\n \
       <head>\n \
         <title>View Log</title>\n \
-        <div><h2 style="text-align:center;">""" + getProperty("log_fileinfo", "output_report_header") + " " + time.strftime("%x %X") + """</h2><label style="float:right;vertical-align:middle;">""" + processing_time + """</label></div>\n \
+        <div><h2 style="text-align:center;">""" + config.get("log_fileinfo", "output_report_header") + " " + time.strftime("%x %X") + """</h2><label style="float:right;vertical-align:middle;">""" + processing_time + """</label></div>\n \
         <br><br>\n"""
   if invokedFromWeb: 
     html_message = html_message + """\n \
-        <b>Input Parameters - Environment:</b> """ + param_list[0] + """\n \
+        <b>Input Parameters - Environment:</b> """ + escape(param_list[0]) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Cluster:</b> """ + param_list[1] + """\n \
+        <b>Cluster:</b> """ + escape(param_list[1]) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Server(s):</b> """ + param_list[2] + """\n \
+        <b>Server(s):</b> """ + escape(param_list[2]) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Log File Type:</b> """ + param_list[3] + """\n \
+        <b>Log File Type:</b> """ + escape(param_list[3]) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Search Keywords:</b> """ + param_list[4] + """\n \
+        <b>Search Keywords:</b> """ + escape(param_list[4]) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Search Criteria :</b> """ + param_list[5] + """\n"""
+        <b>Search Criteria :</b> """ + escape(param_list[5]) + """\n"""
   else:
     html_message = html_message + """ \
-        <b>Input Parameters - Environment:</b> """ + input_param_env + """\n \
+        <b>Input Parameters - Environment:</b> """ + escape(input_param_env) + """\n \
+        &nbsp;&nbsp;&nbsp;&nbsp;\n \
+        <b>Cluster:</b> """ + escape(input_param_cluster_name) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Cluster:</b> """ + input_param_cluster_name + """\n \
+        <b>Server(s):</b> """ + escape(input_param_server_name) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Server(s):</b> """ + input_param_server_name + """\n \
+        <b>Search Keywords:</b> """ + escape(input_param_search_keywords) + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Search Keywords:</b> """ + input_param_search_keywords + """\n \
+        <b>Search Criteria :</b> """ + escape(input_param_search_criteria) + """\n"""
+  for name, search_time in getTimeRangeParameters(param_list):
+    html_message = html_message + """\n \
         &nbsp;&nbsp;&nbsp;&nbsp;\n \
-        <b>Search Criteria :</b> """ + input_param_search_criteria + """\n"""
+        <b>""" + name.capitalize() + """:</b> """ + escape(search_time) + """\n"""
   html_message = html_message + """\n \
         <br>\n"""
-  if len(all_log_elements) == 0:
-    html_message = html_message +  """ \
-      <table border=1 align=center><tr><td><h3><font color=red>""" + getProperty("messages", "info_no_data_found") + """</font></h3></td></tr></table>\n \
+  return html_message
+
+def buildHTMLNoData():
+  config = getConfig()
+  html_message = ""
+  html_message = html_message +  """ \
+      <table border=1 align=center><tr><td><h3><font color=red>""" + config.get("messages", "info_no_data_found") + """</font></h3></td></tr></table>\n \
         </head>\n \
       </html>\n"""
-    return html_message
-  for all_keyword_count in all_keyword_counts:
-    html_message_count_body_row = ""
-    keyword_count_server = all_keyword_count[4]
-    for keyword_count_server_row in keyword_count_server:
-      if keyword_count_server_row[1] > 0:
-        html_message_count_body_row = html_message_count_body_row + """<tr>\n"""
-        html_message_count_body_row = html_message_count_body_row + """\n"""
-        for i in range(len(all_keyword_count) - 1): 
-          html_message_count_body_row = html_message_count_body_row + """\n \
-             <td>""" + all_keyword_count[i] + """</td>\n"""
-        html_message_count_body_row = html_message_count_body_row + """\n \
-          <td>""" + keyword_count_server_row[0] + """</td>\n"""
-        if invokedFromWeb:
-          if param_list[2] == "all":
-            html_message_count_body_row = html_message_count_body_row + """\n \
-            <td id='""" + all_keyword_count[len(all_keyword_count) - 2] + """' align='right'><a href="#" onclick="highlightSelectedRow('logCount', '""" + all_keyword_count[len(all_keyword_count) - 2] + """');showHideLogData('logData', '""" + all_keyword_count[len(all_keyword_count) - 2] + """');">""" + str(keyword_count_server_row[1]) + """</a></td>\n"""
-          else:
-            html_message_count_body_row = html_message_count_body_row + """\n \
-            <td align='right'>""" + str(keyword_count_server_row[1]) + """</td>\n"""
-        else:
-          html_message_count_body_row = html_message_count_body_row + """\n \
-          <td align='right'>""" + str(keyword_count_server_row[1]) + """</td>\n"""
-        html_message_count_body_row = html_message_count_body_row + """</tr>\n"""
-    html_message_count_body = html_message_count_body + html_message_count_body_row
-  for all_log_element in all_log_elements:
-    html_message_data_body_row = ""
-    log_msg_list = all_log_element[4]
-    for log_msg_list_row in log_msg_list:
-      html_message_data_body_row =  html_message_data_body_row + """<tr id='""" + all_log_element[3] + """'>\n""" 
-      html_message_data_body_row = html_message_data_body_row + """\n"""
-      for i in range(len(all_log_element) - 1):
-        html_message_data_body_row = html_message_data_body_row + """\n \
-          <td>""" + all_log_element[i] + """</td>\n"""
-      for i in range(len(log_msg_list_row)):
-        html_message_data_body_row = html_message_data_body_row + """\n \
-          <td>""" + log_msg_list_row[i] + """</td>\n"""
-      html_message_data_body_row = html_message_data_body_row + """</tr>\n"""
-    html_message_data_body = html_message_data_body + html_message_data_body_row
-  if invokedFromWeb:
-    html_message = html_message + """<b>Download:</b> <a href='/""" + output_filename +      """'>Text Output File</a><br><br>\n""" 
-  html_message = html_message + """\n \
-            </h4>\n \
-            <script type="text/javascript">\n \
-              function highlightSelectedRow(table_id, server) {\n \
-                table = document.getElementById(table_id);\n \
-                for (var i = 1; i < table.rows.length; i++) {\n \
-                  var cells = table.rows[i].cells;
-                  if (cells[5].id == server) \n \
-                    table.rows[i].style.backgroundColor = "yellow";\n \
-                  else\n \
-                    table.rows[i].style.backgroundColor = "";\n \
-                }\n \
-              }\n \
-              function showHideLogData(table_id, cluster) {\n \
-                table = document.getElementById(table_id);\n \
-                for (var i = 0; i < table.rows.length; i++) {\n \
-                  if (table.rows[i].id == cluster)\n \
-                    table.rows[i].style.display = "";\n \
-                  else\n \
-                    table.rows[i].style.display = "none";\n \
-                }\n \
-              }\n \
-            </script>\n \
-          </head>\n \
-	  <body>\n \
-	    <table id='logCount' border=1>\n \
-              <thead>\n \
-	      <tr bgcolor=#f0f0f0>\n"""
-  for header in data_element_fixed_headers:
-    html_message = html_message + """<th>""" + header + """</th>\n"""
-  for header in data_element_count_headers:
-    html_message = html_message + """<th>""" + header + """</th>\n"""
-  html_message = html_message + """</tr>\n \
-        </thead>\n \
-        <tbody>\n"""
-  html_message = html_message + html_message_count_body + """\n \
-              </tbody>\n \
-            </table>\n \
-            <br>\n \
-            <br>\n \
-	    <table id='logData' border=1>\n \
-              <thead>\n \
-	      <tr bgcolor=#f0f0f0>\n """
-  for header in data_element_fixed_headers:
-    html_message = html_message + """<th>""" + header + """</th>\n"""
-  for header in data_element_logmsg_headers:
-    html_message = html_message + """<th>""" + header + """</th>\n"""
-  html_message = html_message + """</tr>\n \
+  return html_message
+
+def escapeHTMLCells(cells):
+  # One escape over the cells joined together instead of one per cell, cells holding the separator
+  # themselves are escaped one by one
+  html_cells = "\0".join(cells)
+  if html_cells.count("\0") != len(cells) - 1:
+    return [escape(cell) for cell in cells]
+  return escape(html_cells).split("\0")
+
+def getHTMLCellTemplate(number_of_cells):
+  html_cell_template = html_output_cell_templates.get(number_of_cells)
+  if html_cell_template is None:
+    html_cell_template = html_output_data_cell * number_of_cells
+    html_output_cell_templates[number_of_cells] = html_cell_template
+  return html_cell_template
+
+def buildHTMLCountRows(param_list, all_keyword_count, invokedFromWeb):
+  html_message = []
+  html_row_open = html_output_count_row_open + (html_output_count_fixed_cell * (len(all_keyword_count) - 1)) % tuple(escapeHTMLCells(all_keyword_count[:-1]))
+  server = escape(all_keyword_count[len(all_keyword_count) - 2])
+  keyword_count_server = all_keyword_count[4]
+  for keyword_count_server_row in keyword_count_server:
+    if keyword_count_server_row[1] > 0:
+      html_message.append(html_row_open)
+      html_message.append(html_output_data_cell % escape(keyword_count_server_row[0]))
+      if invokedFromWeb and param_list[2] == "all":
+        html_message.append(html_output_count_link_cell % {"server": server, "count": keyword_count_server_row[1]})
+      else:
+        html_message.append(html_output_count_cell % keyword_count_server_row[1])
+      html_message.append(html_output_row_close)
+  return "".join(html_message)
+
+def renderHTMLDataRows(all_log_element):
+  # Log data rows of a log file in chunks of html_output_batch_rows rows: the columns common to the rows
+  # are rendered once, the log messages of a chunk are escaped together and a row is one template fill
+  log_msg_list = all_log_element[4]
+  html_row_open = html_output_data_row_open % escape(all_log_element[3]) + getHTMLCellTemplate(len(all_log_element) - 1) % tuple(escapeHTMLCells(all_log_element[:-1]))
+  log_msg_rows_iter = iter(log_msg_list)
+  while True:
+    log_msg_rows = list(itertools.islice(log_msg_rows_iter, html_output_batch_rows))
+    if len(log_msg_rows) == 0:
+      break
+    html_cells = escapeHTMLCells([log_msg for log_msg_row in log_msg_rows for log_msg in log_msg_row])
+    html_message = []
+    position = 0
+    for log_msg_row in log_msg_rows:
+      html_message.append(html_row_open)
+      html_message.append(getHTMLCellTemplate(len(log_msg_row)) % tuple(html_cells[position:position + len(log_msg_row)]))
+      html_message.append(html_output_row_close)
+      position = position + len(log_msg_row)
+    yield "".join(html_message)
+
+def buildHTMLTableHead(data_element_headers):
+  html_message = ["""<th>%s</th>\n""" % escape(header) for header in data_element_headers]
+  return "".join(html_message) + """</tr>\n \
         </thead>\n \
         <tbody>\n"""
-  html_message = html_message + html_message_data_body + """\n \
-        </tbody>\n \
-        </table>\n \
-      </body>\n \
-    </html>"""
-  return html_message
+
+def buildHTMLOutput(param_list, output_list, invokedFromWeb):
+  processing_time = "$processing_time"
+  log_filetype = param_list[3]
+  all_keyword_counts = output_list[0]
+  all_log_elements = output_list[1]
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_logmsg_headers = config.getList(log_filetype, "data_element_logmsg_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
+  output_filename = config.get("log_fileinfo", "output_filename")
+  html_message = [buildHTMLHeader(param_list, invokedFromWeb, processing_time)]
+  if len(all_log_elements) == 0:
+    return html_message[0] + buildHTMLNoData()
+  if invokedFromWeb:
+    html_message.append(html_output_download % escape(output_filename))
+  spilled_records = sum([getSpilledRecords(all_log_element[4]) for all_log_element in all_log_elements])
+  if spilled_records > 0:
+    html_message.append(html_output_spilled % (escape(config.get("messages", "info_records_spilled")), spilled_records))
+  html_message.append(html_output_script + html_output_count_table_open)
+  html_message.append(buildHTMLTableHead(data_element_fixed_headers + data_element_count_headers))
+  for all_keyword_count in all_keyword_counts:
+    html_message.append(buildHTMLCountRows(param_list, all_keyword_count, invokedFromWeb))
+  html_message.append(html_output_count_table_close + html_output_data_table_open)
+  html_message.append(buildHTMLTableHead(data_element_fixed_headers + data_element_logmsg_headers))
+  for all_log_element in all_log_elements:
+    html_message.extend(renderHTMLDataRows(all_log_element))
+  html_message.append(html_output_data_table_close + html_output_close)
+  return "".join(html_message)
+
+def streamHTMLOutput(param_list, log_file_results, invokedFromWeb):
+  # HTML output written while the log files are searched: the log data rows of each log file are sent as
+  # soon as it is searched, the keyword count table (sorted on complete counts) and the processing time follow
+  # at the end and the count table is moved above the log data table by the browser
+  start_time = time.time()
+  all_keyword_counts = []
+  spilled_records = 0
+  log_filetype = param_list[3]
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_logmsg_headers = config.getList(log_filetype, "data_element_logmsg_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
+  output_filename = config.get("log_fileinfo", "output_filename")
+  yield buildHTMLHeader(param_list, invokedFromWeb, """<span id='processing_time'></span>""")
+  for log_file_result in log_file_results:
+    if len(all_keyword_counts) == 0:
+      html_message = []
+      if invokedFromWeb:
+        html_message.append(html_output_download % escape(output_filename))
+      html_message.append(html_output_script + html_output_data_table_open)
+      html_message.append(buildHTMLTableHead(data_element_fixed_headers + data_element_logmsg_headers))
+      yield "".join(html_message)
+    all_keyword_counts.append(log_file_result[:2])
+    spilled_records = spilled_records + getSpilledRecords(log_file_result[2][4])
+    for html_message in renderHTMLDataRows(log_file_result[2]):
+      yield html_message
+  mi, ss = divmod(time.time() - start_time, 60)
+  html_message = """<script type="text/javascript">document.getElementById('processing_time').innerHTML = '""" + config.get("processing_info", "processing_time_header") + " " + str("%02dm %fs" %(mi, ss)) + """';</script>\n"""
+  if len(all_keyword_counts) == 0:
+    yield buildHTMLNoData() + html_message
+    return
+  html_message = [html_output_data_table_close, html_message]
+  html_message.append("""<div id='logCountSection'>\n""")
+  if spilled_records > 0:
+    html_message.append(html_output_spilled % (escape(config.get("messages", "info_records_spilled")), spilled_records))
+  html_message.append(html_output_count_table_open)
+  html_message.append(buildHTMLTableHead(data_element_fixed_headers + data_element_count_headers))
+  # Same order as performProcessingLogData(): descending counts, then log file order
+  for all_keyword_count in [x[1] for x in sorted(all_keyword_counts, key=getLogFileResultOrder)]:
+    html_message.append(buildHTMLCountRows(param_list, all_keyword_count, invokedFromWeb))
+  html_message.append(html_output_count_table_close + """</div>\n""")
+  html_message.append("""<script type="text/javascript">\n \
+            var log_data_table = document.getElementById('logData');\n \
+            log_data_table.parentNode.insertBefore(document.getElementById('logCountSection'), log_data_table);\n \
+          </script>\n""")
+  html_message.append(html_output_close)
+  yield "".join(html_message)
 
 # For REST API Service: JSON
 def buildJSONOutput(param_list, output_list):
@@ -641,36 +2866,106 @@ def buildJSONOutput(param_list, output_list):
   output_input_params_dict["log_filetype"] = param_list[3]
   output_input_params_dict["search_keywords"] = param_list[4]
   output_input_params_dict["search_criteria"] = param_list[5]
+  for name, search_time in getTimeRangeParameters(param_list):
+    output_input_params_dict[name] = search_time
   output_dict["input_parameters"] = output_input_params_dict
-  data_element_fixed_headers = getProperty("log_fileinfo", "data_element_fixed_headers").split(",")
-  data_element_count_headers = getProperty("log_fileinfo", "data_element_count_headers").split(",")
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
   all_keyword_counts = output_list[0]
   for all_keyword_count in all_keyword_counts:
-    keyword_count_server = all_keyword_count[4]
-    for keyword_count_server_row in keyword_count_server:
-      if int(keyword_count_server_row[1]) > 0:
-        output_log_count_dict_item = {}
-        for i in range(len(all_keyword_count) - 1):
-          output_log_count_dict_item[data_element_fixed_headers[i]] = all_keyword_count[i]
-        for i in range(len(keyword_count_server_row)):
-          output_log_count_dict_item[data_element_count_headers[i]] = keyword_count_server_row[i]
-        output_log_count_list.append(output_log_count_dict_item) 
+    output_log_count_list.extend(buildJSONCountItems(all_keyword_count, data_element_fixed_headers, data_element_count_headers))
   output_dict["log_count"] = output_log_count_list
-  data_element_logmsg_headers = getProperty(param_list[3], "data_element_logmsg_headers").split(",")
+  data_element_logmsg_headers = config.getList(param_list[3], "data_element_logmsg_headers")
   all_log_elements = output_list[1]
   for all_log_element in all_log_elements:
-    log_msg_list = all_log_element[4]
-    for log_msg_list_row in log_msg_list:
-      output_log_data_dict_item = {}
-      for i in range(len(all_log_element) - 1):
-        output_log_data_dict_item[data_element_fixed_headers[i]] = all_log_element[i]
-      for i in range(len(log_msg_list_row)):
-        output_log_data_dict_item[data_element_logmsg_headers[i]] = log_msg_list_row[i]
-      output_log_data_list.append(output_log_data_dict_item)
+    output_log_data_list.extend(buildJSONDataItems(all_log_element, data_element_fixed_headers, data_element_logmsg_headers))
   output_dict["log_data"] = output_log_data_list
+  spilled_records = sum([getSpilledRecords(all_log_element[4]) for all_log_element in all_log_elements])
+  if spilled_records > 0:
+    output_dict["spilled_records"] = spilled_records
   all_output_dict["results"] = output_dict
   return all_output_dict 
 
+def buildJSONCountItems(all_keyword_count, data_element_fixed_headers, data_element_count_headers):
+  output_log_count_list = []
+  keyword_count_server = all_keyword_count[4]
+  for keyword_count_server_row in keyword_count_server:
+    if int(keyword_count_server_row[1]) > 0:
+      output_log_count_dict_item = {}
+      for i in range(len(all_keyword_count) - 1):
+        output_log_count_dict_item[data_element_fixed_headers[i]] = all_keyword_count[i]
+      for i in range(len(keyword_count_server_row)):
+        output_log_count_dict_item[data_element_count_headers[i]] = keyword_count_server_row[i]
+      output_log_count_list.append(output_log_count_dict_item) 
+  return output_log_count_list
+
+def buildJSONDataItems(all_log_element, data_element_fixed_headers, data_element_logmsg_headers):
+  output_log_data_list = []
+  log_msg_list = all_log_element[4]
+  for log_msg_list_row in log_msg_list:
+    output_log_data_dict_item = {}
+    for i in range(len(all_log_element) - 1):
+      output_log_data_dict_item[data_element_fixed_headers[i]] = all_log_element[i]
+    for i in range(len(log_msg_list_row)):
+      output_log_data_dict_item[data_element_logmsg_headers[i]] = log_msg_list_row[i]
+    output_log_data_list.append(output_log_data_dict_item)
+  return output_log_data_list
+
+def dumpJSON(data, indent):
+  # Same layout as the complete JSON output, nested at the given indent
+  return json.dumps(data, sort_keys=True, indent=4, separators=(',', ': ')).replace("\n", "\n" + " " * indent)
+
+def streamJSONOutput(param_list, log_file_results, page=None):
+  # JSON output written while the log files are searched: "log_data" items of each log file are sent as soon
+  # as it is searched and "log_count" (sorted on complete counts) follows at the end, then "page" for a paged
+  # search (see streamSearchPage()) and "spilled_records" when records were kept on disk (see spillLogFileResults())
+  all_keyword_counts = []
+  spilled_records = 0
+  output_input_params_dict = {}
+  output_input_params_dict["env"] = param_list[0]
+  output_input_params_dict["cluster"] = param_list[1]
+  output_input_params_dict["server"] = param_list[2]
+  output_input_params_dict["log_filetype"] = param_list[3]
+  output_input_params_dict["search_keywords"] = param_list[4]
+  output_input_params_dict["search_criteria"] = param_list[5]
+  for name, search_time in getTimeRangeParameters(param_list):
+    output_input_params_dict[name] = search_time
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
+  data_element_logmsg_headers = config.getList(param_list[3], "data_element_logmsg_headers")
+  yield """{\n    "results": {\n        "input_parameters": """ + dumpJSON(output_input_params_dict, 8) + """,\n        "log_data": ["""
+  separator = "\n            "
+  for log_file_result in log_file_results:
+    all_keyword_counts.append(log_file_result[:2])
+    spilled_records = spilled_records + getSpilledRecords(log_file_result[2][4])
+    output_log_data = []
+    for output_log_data_dict_item in buildJSONDataItems(log_file_result[2], data_element_fixed_headers, data_element_logmsg_headers):
+      output_log_data.append(separator + dumpJSON(output_log_data_dict_item, 12))
+      separator = ",\n            "
+    yield "".join(output_log_data)
+  output_log_count_list = []
+  for all_keyword_count in [x[1] for x in sorted(all_keyword_counts, key=getLogFileResultOrder)]:
+    output_log_count_list.extend(buildJSONCountItems(all_keyword_count, data_element_fixed_headers, data_element_count_headers))
+  if separator == "\n            ":
+    json_message = "]"
+  else:
+    json_message = "\n        ]"
+  json_message = json_message + """,\n        "log_count": """ + dumpJSON(output_log_count_list, 8)
+  if page is not None:
+    json_message = json_message + """,\n        "page": """ + dumpJSON(buildPageItem(page), 8)
+  if spilled_records > 0:
+    json_message = json_message + """,\n        "spilled_records": """ + str(spilled_records)
+  yield json_message + """\n    }\n}"""
+
+def buildPageItem(page):
+  page_item = {}
+  for name in ["limit", "offset", "cursor", "order", "records", "next_cursor", "total_records"]:
+    if name in page:
+      page_item[name] = page[name]
+  return page_item
+
 # For REST API Service: XML
 def buildXMLOutput(param_list, output_list):
   results = ET.Element("results")
@@ -687,9 +2982,13 @@ def buildXMLOutput(param_list, output_list):
   child.text = param_list[4]
   child = ET.SubElement(input_parameters, "search_criteria")
   child.text = param_list[5]
+  for name, search_time in getTimeRangeParameters(param_list):
+    child = ET.SubElement(input_parameters, name)
+    child.text = search_time
 
-  data_element_fixed_headers = getProperty("log_fileinfo", "data_element_fixed_headers").split(",")
-  data_element_count_headers = getProperty("log_fileinfo", "data_element_count_headers").split(",")
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
   all_keyword_counts = output_list[0]
   log_count = ET.SubElement(results, "log_count")
   for all_keyword_count in all_keyword_counts:
@@ -703,7 +3002,7 @@ def buildXMLOutput(param_list, output_list):
         for i in range(len(keyword_count_server_row)):
           child = ET.SubElement(log_count_item, data_element_count_headers[i].replace(" ", "_"))
           child.text = (str(keyword_count_server_row[i]) if isinstance(keyword_count_server_row[i], int) else keyword_count_server_row[i])
-  data_element_logmsg_headers = getProperty(param_list[3], "data_element_logmsg_headers").split(",")
+  data_element_logmsg_headers = config.getList(param_list[3], "data_element_logmsg_headers")
   all_log_elements = output_list[1]
   log_data = ET.SubElement(results, "log_data")
   for all_log_element in all_log_elements:
@@ -716,18 +3015,75 @@ def buildXMLOutput(param_list, output_list):
       for i in range(len(log_msg_list_row)):
         child = ET.SubElement(log_data_item, data_element_logmsg_headers[i].replace(" ", "_"))
         child.text = log_msg_list_row[i]
+  spilled_records = sum([getSpilledRecords(all_log_element[4]) for all_log_element in all_log_elements])
+  if spilled_records > 0:
+    child = ET.SubElement(results, "spilled_records")
+    child.text = str(spilled_records)
   xml_tree_string = ET.tostring(results, "utf-8")
   return xml_tree_string
 
-def writeTextOutput(param_list, output_list):
+def buildXMLElement(tag, text, indent):
+  if text:
+    return " " * indent + "<" + tag + ">" + escape(text, {'"': "&quot;"}) + "</" + tag + ">\n"
+  return " " * indent + "<" + tag + "/>\n"
+
+def streamXMLOutput(param_list, log_file_results, page=None):
+  # XML output written while the log files are searched, laid out as the pretty printed complete XML output:
+  # "log_data" items of each log file are sent as soon as it is searched and "log_count" follows at the end,
+  # then "page" for a paged search (see streamSearchPage()) and "spilled_records" (see spillLogFileResults())
+  all_keyword_counts = []
+  spilled_records = 0
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_count_headers = config.getList("log_fileinfo", "data_element_count_headers")
+  data_element_logmsg_headers = config.getList(param_list[3], "data_element_logmsg_headers")
+  xml_message = """<?xml version="1.0" ?>\n<results>\n    <input_parameters>\n"""
+  for i, tag in enumerate(["env", "cluster", "server", "log_filetype", "search_keywords", "search_criteria"]):
+    xml_message = xml_message + buildXMLElement(tag, param_list[i], 8)
+  for name, search_time in getTimeRangeParameters(param_list):
+    xml_message = xml_message + buildXMLElement(name, search_time, 8)
+  yield xml_message + """    </input_parameters>\n    <log_data>\n"""
+  for log_file_result in log_file_results:
+    all_keyword_counts.append(log_file_result[:2])
+    all_log_element = log_file_result[2]
+    spilled_records = spilled_records + getSpilledRecords(all_log_element[4])
+    xml_message = []
+    for log_msg_list_row in all_log_element[4]:
+      xml_message.append("""        <log_data_item>\n""")
+      for i in range(len(all_log_element) - 1):
+        xml_message.append(buildXMLElement(data_element_fixed_headers[i].replace(" ", "_"), all_log_element[i], 12))
+      for i in range(len(log_msg_list_row)):
+        xml_message.append(buildXMLElement(data_element_logmsg_headers[i].replace(" ", "_"), log_msg_list_row[i], 12))
+      xml_message.append("""        </log_data_item>\n""")
+    yield "".join(xml_message)
+  xml_message = """    </log_data>\n    <log_count>\n"""
+  for all_keyword_count in [x[1] for x in sorted(all_keyword_counts, key=getLogFileResultOrder)]:
+    for keyword_count_server_row in all_keyword_count[4]:
+      if int(keyword_count_server_row[1]) > 0:
+        xml_message = xml_message + """        <log_count_item>\n"""
+        for i in range(len(all_keyword_count) - 1):
+          xml_message = xml_message + buildXMLElement(data_element_fixed_headers[i].replace(" ", "_"), all_keyword_count[i], 12)
+        for i in range(len(keyword_count_server_row)):
+          xml_message = xml_message + buildXMLElement(data_element_count_headers[i].replace(" ", "_"), str(keyword_count_server_row[i]), 12)
+        xml_message = xml_message + """        </log_count_item>\n"""
+  xml_message = xml_message + """    </log_count>\n"""
+  if page is not None:
+    xml_message = xml_message + """    <page>\n"""
+    page_item = buildPageItem(page)
+    for name in ["limit", "offset", "cursor", "order", "records", "next_cursor", "total_records"]:
+      if name in page_item:
+        xml_message = xml_message + buildXMLElement(name, (None if page_item[name] is None else str(page_item[name])), 8)
+    xml_message = xml_message + """    </page>\n"""
+  if spilled_records > 0:
+    xml_message = xml_message + buildXMLElement("spilled_records", str(spilled_records), 4)
+  yield xml_message + """</results>\n"""
+
+def buildTextOutputHeader(param_list):
   output_header = ""
-  all_log_elements = output_list[1]
-  if len(all_log_elements) == 0:
-    return
   log_filetype = param_list[3]
-  data_element_fixed_headers = getProperty("log_fileinfo", "data_element_fixed_headers").split(",")
-  data_element_logmsg_headers = getProperty(log_filetype, "data_element_logmsg_headers").split(",")
-  output_filename = getProperty("log_fileinfo", "output_filename")
+  config = getConfig()
+  data_element_fixed_headers = config.getList("log_fileinfo", "data_element_fixed_headers")
+  data_element_logmsg_headers = config.getList(log_filetype, "data_element_logmsg_headers")
   for header in data_element_fixed_headers:
     if output_header == "":
       output_header = header
@@ -738,28 +3094,51 @@ def writeTextOutput(param_list, output_list):
       output_header = header
     else:
       output_header = output_header + """\t""" + header
+  return output_header + '\n'
 
-  output_data = ""
+def buildTextOutputRows(all_log_element):
+  output_data = []
+  log_msg_list = all_log_element[4]
+  for log_msg_list_row in log_msg_list:
+    output_data_row = ""
+    for i in range(len(all_log_element) - 1):
+      output_data_row = output_data_row + all_log_element[i] + """\t"""
+    for i in range(len(log_msg_list_row)):
+      output_data_row = output_data_row + log_msg_list_row[i] + """\t"""
+    output_data_row = output_data_row.rstrip("\t")
+    output_data.append(output_data_row + '\n')
+  return "".join(output_data)
+
+def writeTextOutput(param_list, output_list):
+  all_log_elements = output_list[1]
+  if len(all_log_elements) == 0:
+    return
+  output_filename = getConfig().get("log_fileinfo", "output_filename")
   output_file = open(output_filename, "w")
-  output_file.write(output_header)
-  output_file.write('\n')
+  output_file.write(buildTextOutputHeader(param_list))
   for all_log_element in all_log_elements:
-    log_msg_list = all_log_element[4]
-    for log_msg_list_row in log_msg_list:
-      output_data_row = ""
-      for i in range(len(all_log_element) - 1):
-        output_data_row = output_data_row + all_log_element[i] + """\t"""
-      for i in range(len(log_msg_list_row)):
-        output_data_row = output_data_row + log_msg_list_row[i] + """\t"""
-      output_data_row = output_data_row.rstrip("\t")
-      output_file.write(output_data_row)
-      output_file.write('\n')
+    output_file.write(buildTextOutputRows(all_log_element))
   output_file.close()
 
+def streamTextOutput(param_list, log_file_results):
+  # Passes the log file results through while writing them to the text output file as writeTextOutput()
+  output_file = None
+  try:
+    for log_file_result in log_file_results:
+      if output_file is None:
+        output_file = open(getConfig().get("log_fileinfo", "output_filename"), "w")
+        output_file.write(buildTextOutputHeader(param_list))
+      output_file.write(buildTextOutputRows(log_file_result[2]))
+      yield log_file_result
+  finally:
+    if output_file is not None:
+      output_file.close()
+
 def sendEMailMessage(data):
-  sent_from = getProperty("email_info", "email_sent_from") + "@" + socket.gethostname()
-  email_recipient_list = getProperty("email_info", "email_recipient_list").split(",")
-  output_filename = getProperty("log_fileinfo", "output_filename")
+  config = getConfig()
+  sent_from = config.get("email_info", "email_sent_from") + "@" + socket.gethostname()
+  email_recipient_list = config.getList("email_info", "email_recipient_list")
+  output_filename = config.get("log_fileinfo", "output_filename")
   msg = MIMEMultipart('alternative')
   msg['Subject'] = getProperty("email_info", "email_subject_header") + " " + time.strftime("%x %X")
   msg['From'] = sent_from
@@ -780,11 +3159,17 @@ def sendEMailMessage(data):
 if __name__ == "__main__":
   start_time = time.time()
   param_list = validateInputParameters()
-  output_list = performProcessingLogData(param_list)
+  scan_state = None
+  if getSearchOption(param_list, "incremental") == "yes":
+    scan_state = loadScanState()
+  output_list = performProcessingLogData(param_list, scan_state)
   html_message = buildHTMLOutput(param_list, output_list, False)
   end_time = time.time()
   mi, ss = divmod(end_time - start_time, 60)
-  html_message = html_message.replace("$processing_time", getProperty("processing_info", "processing_time_header") + " " + str("%02dm %fs" %(mi, ss)))
+  html_message = html_message.replace("$processing_time", getProperty("processing_info", "processing_time_header") + " " + str("%02dm %fs" %(mi, ss)), 1)
   writeTextOutput(param_list, output_list)
   sendEMailMessage(html_message) 
+  # Checkpoints are only moved once the new records have been reported
+  if scan_state is not None:
+    saveScanState(scan_state)
   sys.exit()
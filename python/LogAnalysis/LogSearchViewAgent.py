@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+
+############################################################################
+# Script Name:  LogSearchViewAgent.py
+# Description:  Self contained log scanner executed on a remote machine by LogSearchView.py.
+#               It is not installed on the remote machine: LogSearchView.py sends this file over
+#               the ssh channel to "python -" and reads back only the matching records.
+# Functionalities:
+#		- Reads the Log file (or a byte range of it) on the remote machine
+#		- Merges log data items enclosed with tags spread over multiple lines
+#		- Applies the Search Keywords and Criteria, or the compiled search query, and separates Data Elements of matching records
+#		- Keeps only the records between the from and to times, reading only their window of a log file appended in time order
+#		- Writes matching records and keyword counts to stdout in a framed format
+# Input Parameters:
+#		- Search specification in JSON: log_filename_with_path, byte_range, data_element_tag,
+#		  number_of_data_elements, search_keywords, search_criteria, checkpoint (incremental scan or null),
+#		  record_limit (paged search or null), time_filter (from/to search or null), query (compiled search query or null)
+# Output Frames:
+#		- Record: "R <element length> <element length> ...\n" followed by the data elements
+#		- Checkpoint: "K <offset> <halfline> <linecache length>\n" followed by the open record
+#		- Record Limit: "L <number of matching records>\n"
+#		- Keyword Counts (last frame): "C <count> <count> ...\n"
+#		- Error: "E <message>\n"
+# Change History:
+#	Initial:
+#		- Date: 10/18/2026
+############################################################################
+
+import sys
+import os
+import re
+import json
+import time
+import collections
+
+def matchLine(line, match_keywords, search_criteria):
+  line = line.lower()
+  if search_criteria == "all":
+    for match_keyword in match_keywords:
+      if not match_keyword in line:
+        return None
+  elif search_criteria == "any":
+    for match_keyword in match_keywords:
+      if match_keyword in line:
+        break
+    else:
+      return None
+  else:
+    return None
+  return [line.count(match_keyword) for match_keyword in match_keywords]
+
+def getQueryTermText(term, line, record, splitRecord):
+  # Same query evaluation as QueryMatcher in LogSearchView.py, term is ["term", text, literal, regex, data element id]
+  if term[4] is None:
+    return line
+  if len(record) == 0:
+    record.append(splitRecord(line))
+  if term[4] < len(record[0]):
+    return record[0][term[4]]
+  return ""
+
+def matchQueryNode(node, line, record, regexes, splitRecord):
+  if node[0] == "term":
+    text = getQueryTermText(node, line, record, splitRecord)
+    if node[2] is not None:
+      return node[2] in text
+    return regexes[node[3]].search(text) is not None
+  if node[0] == "and":
+    for child in node[1]:
+      if not matchQueryNode(child, line, record, regexes, splitRecord):
+        return False
+    return True
+  if node[0] == "or":
+    for child in node[1]:
+      if matchQueryNode(child, line, record, regexes, splitRecord):
+        return True
+    return False
+  return not matchQueryNode(node[1], line, record, regexes, splitRecord)
+
+def countQueryTerm(term, line, record, regexes, splitRecord):
+  text = getQueryTermText(term, line, record, splitRecord)
+  if term[2] is not None:
+    return (text.count(term[2]) if term[2] else 0)
+  return len(regexes[term[3]].findall(text))
+
+def matchQuery(query, line, splitRecord):
+  line = line.lower()
+  if query["prefilter_keywords"] is not None:
+    for prefilter_keyword in query["prefilter_keywords"]:
+      if prefilter_keyword in line:
+        break
+    else:
+      return None
+  record = []
+  if not matchQueryNode(query["plan"], line, record, query["regexes"], splitRecord):
+    return None
+  if len(query["count_terms"]) == 0:
+    return [1]
+  return [countQueryTerm(count_term, line, record, query["regexes"], splitRecord) for count_term in query["count_terms"]]
+
+def encodeQueryNode(node, regexes):
+  # Query plan node with byte strings, the regular expressions of its terms are compiled into regexes
+  if node[0] == "term":
+    node = [node[0]] + [(value.encode("utf-8") if isinstance(value, unicode) else value) for value in node[1:]]
+    if node[3] is not None:
+      regexes[node[3]] = re.compile(node[3], re.IGNORECASE)
+    return node
+  if node[0] == "not":
+    return [node[0], encodeQueryNode(node[1], regexes)]
+  return [node[0], [encodeQueryNode(child, regexes) for child in node[1]]]
+
+def joinRecordLines(record_lines):
+  return " ".join([record_line for record_line in [line.rstrip() for line in record_lines[:-1]] if record_line] + record_lines[-1:])
+
+def readLines(log_filename_with_path, byte_range, regex_record_start, checkpoint=None):
+  # Same range selection as selectRangeLines() in LogSearchView.py, with a checkpoint only complete
+  # lines after the checkpoint offset are read and the offset is moved past them
+  if checkpoint is not None:
+    lines = open(log_filename_with_path)
+    try:
+      lines.seek(checkpoint["offset"])
+      for line in lines:
+        if not line.endswith("\n"):
+          break
+        checkpoint["offset"] = checkpoint["offset"] + len(line)
+        yield line
+    finally:
+      lines.close()
+    return
+  start, end = byte_range or (0, None)
+  lines = open(log_filename_with_path)
+  try:
+    offset = start
+    if start > 0:
+      lines.seek(start - 1)
+      offset = start - 1 + len(lines.readline())
+    record_found = start == 0 or regex_record_start is None
+    for line in lines:
+      if end is not None and offset >= end and (regex_record_start is None or regex_record_start.match(line)):
+        break
+      offset = offset + len(line)
+      if not record_found:
+        if not regex_record_start.match(line):
+          continue
+        record_found = True
+      yield line
+  finally:
+    lines.close()
+
+def readMultilineRecords(lines, data_element_tag, regex_start_plus_end_tag, number_of_data_elements, record_max_size, checkpoint=None):
+  # Same [record, data elements] as parseMultilineBlock() in LogSearchView.py
+  data_element_start_tag = data_element_tag[:1]
+  data_element_end_tag = data_element_tag[1:]
+  record_lines = []
+  if checkpoint is not None and checkpoint["halfline"]:
+    record_lines = [checkpoint["linecache"]]
+  record_size = sum(map(len, record_lines))
+  for line in lines:
+    if line.count(data_element_end_tag) >= number_of_data_elements:
+      line_elements = regex_start_plus_end_tag.findall(line)
+      if len(line_elements) == number_of_data_elements:
+        yield line, line_elements
+        continue
+    if len(record_lines) == 0:
+      if line.startswith(data_element_start_tag):
+        record_lines.append(line)
+        record_size = len(line)
+    elif data_element_end_tag in line:
+      record_lines.append(line)
+      yield joinRecordLines(record_lines), None
+      record_lines = []
+    elif record_max_size == 0 or record_size < record_max_size:
+      record_lines.append(line)
+      record_size = record_size + len(line)
+  if checkpoint is not None:
+    checkpoint["halfline"] = len(record_lines) > 0
+    checkpoint["linecache"] = (joinRecordLines(record_lines) if record_lines else "")
+  elif record_lines:
+    yield joinRecordLines(record_lines), None
+
+def splitLine(line, data_element_tag, regex_start_plus_end_tag):
+  # Same data elements as splitLogLine() in LogSearchView.py
+  if len(data_element_tag) == 0:
+    return [line]
+  elif len(data_element_tag) == 1:
+    return line.split(data_element_tag)
+  elif data_element_tag[:1] == "\\":
+    return re.split(regex_start_plus_end_tag, line)
+  return re.findall(regex_start_plus_end_tag, line)
+
+def parseTimestamp(value, timestamp_format):
+  for text in [value, value.rsplit(" ", 1)[0]]:
+    try:
+      return time.mktime(time.strptime(text, timestamp_format))
+    except (ValueError, OverflowError):
+      pass
+  return None
+
+def getTimestamp(time_filter, line_elements):
+  # Same time stamp as TimeFilter.getTimestamp() in LogSearchView.py, the last one read is kept in time_filter
+  element_ids = time_filter["element_ids"]
+  if len(line_elements) <= max(element_ids):
+    return None
+  value = " ".join([line_elements[element_id].strip() for element_id in element_ids])
+  if value != time_filter.get("last_value"):
+    time_filter["last_value"], time_filter["last_timestamp"] = (value, parseTimestamp(value, time_filter["timestamp_format"]))
+  return time_filter["last_timestamp"]
+
+def matchTime(time_filter, line_elements):
+  timestamp = getTimestamp(time_filter, line_elements)
+  if timestamp is None:
+    return True
+  return (time_filter["from"] is None or timestamp >= time_filter["from"]) and (time_filter["to"] is None or timestamp <= time_filter["to"])
+
+def getProbeTimestamp(log_file, offset, end, time_filter, splitRecord):
+  # Same probe as getProbeTimestamp() in LogSearchView.py
+  probe_start = max(offset - 1, 0)
+  log_file.seek(probe_start)
+  probe = log_file.read(time_filter["probe_size"])
+  line_start = 0
+  if offset > 0:
+    line_start = probe.find("\n") + 1
+    if line_start == 0:
+      return None
+  while True:
+    line_end = probe.find("\n", line_start) + 1
+    if line_end == 0 or probe_start + line_start >= end:
+      break
+    timestamp = getTimestamp(time_filter, splitRecord(probe[line_start:line_end]))
+    if timestamp is not None:
+      return (probe_start + line_start, timestamp)
+    line_start = line_end
+  return None
+
+def seekTimestamp(log_file, start, end, time_filter, splitRecord, isAfter, seek_start):
+  # Same binary search as seekTimestamp() in LogSearchView.py
+  low, high = (start, end)
+  while high - low > time_filter["probe_size"]:
+    middle = (low + high) / 2
+    probe = getProbeTimestamp(log_file, middle, high, time_filter, splitRecord)
+    if probe is None:
+      if seek_start:
+        high = middle
+      else:
+        low = middle
+    elif isAfter(probe[1]):
+      high = (middle if seek_start else probe[0])
+    else:
+      low = probe[0]
+  return (low if seek_start else high)
+
+def seekTimeRange(log_filename_with_path, byte_range, time_filter, splitRecord):
+  # Same window as seekTimeRange() in LogSearchView.py
+  start, end = byte_range or (0, None)
+  log_file_size = os.path.getsize(log_filename_with_path)
+  seek_end = (log_file_size if end is None else min(end, log_file_size))
+  log_file = open(log_filename_with_path, "rb")
+  try:
+    if time_filter["from"] is not None:
+      start = seekTimestamp(log_file, start, seek_end, time_filter, splitRecord, lambda timestamp: timestamp >= time_filter["from"], True)
+    if time_filter["to"] is not None:
+      seek_end = seekTimestamp(log_file, start, seek_end, time_filter, splitRecord, lambda timestamp: timestamp > time_filter["to"], False)
+      end = seek_end
+  finally:
+    log_file.close()
+  return (start, end)
+
+def writeRecord(output, line_elements):
+  output.write("R " + " ".join([str(len(line_element)) for line_element in line_elements]) + "\n")
+  output.write("".join(line_elements))
+
+def addRecord(output, records, line_elements, record_limit):
+  # Same record selection as addLogElement() in LogSearchView.py, the last records of the "newest" order are
+  # kept in records and written at the end
+  if record_limit is None:
+    writeRecord(output, line_elements)
+    return True
+  record_limit["records"] = record_limit["records"] + 1
+  if record_limit["order"] == "newest":
+    records.append(line_elements)
+    return True
+  if record_limit["records"] <= record_limit["limit"]:
+    writeRecord(output, line_elements)
+  return record_limit["total"] or record_limit["records"] < record_limit["limit"]
+
+def scanLogFile(search_spec, output):
+  log_filename_with_path = search_spec["log_filename_with_path"]
+  byte_range = search_spec["byte_range"]
+  data_element_tag = search_spec["data_element_tag"]
+  number_of_data_elements = search_spec["number_of_data_elements"]
+  search_criteria = search_spec["search_criteria"]
+  checkpoint = search_spec["checkpoint"]
+  record_limit = search_spec["record_limit"]
+  time_filter = search_spec["time_filter"]
+  query = search_spec["query"]
+  records = collections.deque(maxlen=(record_limit or {}).get("limit"))
+  match_keywords = [search_keyword.lower() for search_keyword in search_spec["search_keywords"]]
+  keyword_count = [0] * len(match_keywords)
+  if not os.path.isfile(log_filename_with_path):
+    return keyword_count
+  if len(data_element_tag) == 0:
+    regex_start_plus_end_tag = re.compile(r"!.")
+  elif len(data_element_tag) == 1:
+    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_tag) + r"")
+  elif data_element_tag[:1] == "\\":
+    regex_start_plus_end_tag = re.compile(r"" + data_element_tag + r"")
+  elif len(data_element_tag) == 2:
+    data_element_start_tag = data_element_tag[:1]
+    data_element_end_tag = data_element_tag[1:]
+    regex_start_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)")
+    regex_start_plus_end_tag = re.compile(r"" + re.escape(data_element_start_tag) + r"(.*?)" + r"" + re.escape(data_element_end_tag))
+  splitRecord = lambda line: splitLine(line, data_element_tag, regex_start_plus_end_tag)
+  if query is not None:
+    matchRecord = lambda line: matchQuery(query, line, splitRecord)
+  else:
+    matchRecord = lambda line: matchLine(line, match_keywords, search_criteria)
+  if time_filter is not None and time_filter["sorted"] and checkpoint is None:
+    byte_range = seekTimeRange(log_filename_with_path, byte_range, time_filter, splitRecord)
+    if byte_range[1] is not None and byte_range[0] >= byte_range[1]:
+      return keyword_count
+  if len(data_element_tag) == 0 or len(data_element_tag) == 1 or data_element_tag[:1] == "\\":
+    for line in readLines(log_filename_with_path, byte_range, None, checkpoint):
+      if len(re.findall(regex_start_plus_end_tag, line)) != (number_of_data_elements - 1):
+        continue
+      keyword_counts = matchRecord(line)
+      if keyword_counts is None:
+        continue
+      line_elements = splitLine(line, data_element_tag, regex_start_plus_end_tag)
+      if time_filter is not None and not matchTime(time_filter, line_elements):
+        continue
+      for i in range(len(keyword_counts)):
+        keyword_count[i] = keyword_count[i] + keyword_counts[i]
+      if not addRecord(output, records, line_elements, record_limit):
+        break
+  elif len(data_element_tag) == 2:
+    lines = readLines(log_filename_with_path, byte_range, regex_start_tag, checkpoint)
+    for line, line_elements in readMultilineRecords(lines, data_element_tag, regex_start_plus_end_tag, number_of_data_elements, search_spec["record_max_size"], checkpoint):
+      keyword_counts = matchRecord(line)
+      if keyword_counts is None:
+        continue
+      if line_elements is None:
+        line_elements = regex_start_plus_end_tag.findall(line)
+        if len(line_elements) != number_of_data_elements:
+          continue
+      if time_filter is not None and not matchTime(time_filter, line_elements):
+        continue
+      for i in range(len(keyword_counts)):
+        keyword_count[i] = keyword_count[i] + keyword_counts[i]
+      if not addRecord(output, records, line_elements, record_limit):
+        break
+  for line_elements in records:
+    writeRecord(output, line_elements)
+  return keyword_count
+
+def main():
+  output = sys.stdout
+  try:
+    search_spec = json.loads(sys.argv[1])
+    # Paths and elements are byte strings on the reading side
+    for key in ["log_filename_with_path", "data_element_tag", "search_criteria"]:
+      search_spec[key] = search_spec[key].encode("utf-8")
+    search_spec["search_keywords"] = [search_keyword.encode("utf-8") for search_keyword in search_spec["search_keywords"]]
+    if search_spec["time_filter"] is not None:
+      search_spec["time_filter"]["timestamp_format"] = search_spec["time_filter"]["timestamp_format"].encode("utf-8")
+    query = search_spec["query"]
+    if query is not None:
+      query["regexes"] = {}
+      query["plan"] = encodeQueryNode(query["plan"], query["regexes"])
+      query["count_terms"] = [encodeQueryNode(count_term, query["regexes"]) for count_term in query["count_terms"]]
+      if query["prefilter_keywords"] is not None:
+        query["prefilter_keywords"] = [prefilter_keyword.encode("utf-8") for prefilter_keyword in query["prefilter_keywords"]]
+    checkpoint = search_spec["checkpoint"]
+    if checkpoint is not None:
+      checkpoint["linecache"] = checkpoint["linecache"].encode("utf-8")
+    keyword_count = scanLogFile(search_spec, output)
+    if checkpoint is not None:
+      output.write("K %d %d %d\n" % (checkpoint["offset"], checkpoint["halfline"], len(checkpoint["linecache"])))
+      output.write(checkpoint["linecache"])
+    if search_spec["record_limit"] is not None:
+      output.write("L %d\n" % search_spec["record_limit"]["records"])
+    output.write("C " + " ".join([str(count) for count in keyword_count]) + "\n")
+  except EnvironmentError, e:
+    output.write("E " + str(e).replace("\n", " ") + "\n")
+  output.flush()
+
+if __name__ == "__main__":
+  main()